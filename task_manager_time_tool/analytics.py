@@ -0,0 +1,292 @@
+# analytics.py
+"""
+Auslastung der Sessions: Heatmap Wochentag × Stunde, Anteil je Task und
+Serien aufeinanderfolgender Tage ('report heatmap' und HTML-Export).
+
+Task, Start und Dauer werden als kompakte Ganzzahl-Arrays geladen und in
+wenigen Durchgängen über alle Sessions ausgewertet. Mit NumPy (optional)
+laufen diese Durchgänge vektorisiert, ohne NumPy als Schleifen über die
+array-Werte (gleiches Ergebnis, deutlich langsamer).
+
+Gezählt wird jede Session ab ihrem Start über duration_sec in lokaler Zeit
+und an Stunden- und Tagesgrenzen aufgeteilt: 23:30 bis 00:30 zählt je 30
+Minuten in zwei Stunden und zwei Tagen. Mit NumPy wird dazu die Belegung
+sekundengenau über eine Woche aufsummiert (+1 am Beginn, -1 am Ende, dann
+kumuliert).
+"""
+import datetime
+import time
+from array import array
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from db import session_rows, get_connection
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+# Der 1.1.1970 war ein Donnerstag; Wochentage zählen ab Montag = 0
+EPOCH_WEEKDAY = 3
+
+WEEKDAYS = ("Mo", "Di", "Mi", "Do", "Fr", "Sa", "So")
+
+# Zeilen pro fetchmany beim Laden
+LOAD_CHUNK_SIZE = 10000
+
+# So viele Tasks zeigt 'report heatmap' bei den Anteilen
+TASKS_SHOWN = 10
+
+# Stufen der Text-Heatmap, von leer bis Maximum
+TEXT_LEVELS = " .:-=+*#%@"
+
+
+class TaskShare:
+    """Zeit, Anteil und längste Serie (in Tagen) eines Tasks."""
+    __slots__ = ("name", "total_sec", "share", "longest_streak")
+
+    def __init__(self, name, total_sec, share, longest_streak):
+        self.name = name
+        self.total_sec = total_sec
+        self.share = share
+        self.longest_streak = longest_streak
+
+    def __repr__(self):
+        return f"TaskShare(name={self.name!r}, total_sec={self.total_sec}, share={self.share:.3f})"
+
+
+class Utilisation:
+    """
+    Ergebnis von analyse(), Zeiten in Sekunden.
+
+    heatmap[wochentag][stunde] (Montag = 0), tasks nach Zeit absteigend,
+    longest_streak/streak_start: längste Serie von Tagen mit Sessions.
+    """
+    __slots__ = ("sessions", "total_sec", "heatmap", "tasks", "active_days",
+                 "longest_streak", "streak_start", "backend")
+
+    def __init__(self, sessions, total_sec, heatmap, tasks, active_days, longest_streak, streak_start, backend):
+        self.sessions = sessions
+        self.total_sec = total_sec
+        self.heatmap = heatmap
+        self.tasks = tasks
+        self.active_days = active_days
+        self.longest_streak = longest_streak
+        self.streak_start = streak_start
+        self.backend = backend
+
+    @property
+    def peak(self):
+        """Größter Wert der Heatmap."""
+        return max(max(row) for row in self.heatmap)
+
+    @property
+    def streak_end(self):
+        if self.streak_start is None:
+            return None
+        return self.streak_start + datetime.timedelta(days=self.longest_streak - 1)
+
+    def heatmap_rows(self):
+        """[(Wochentag, [(Stunden, Anteil am Maximum 0..1)] je Stunde)] für das Template."""
+        peak = self.peak or 1
+        return [(WEEKDAYS[day], [(seconds / HOUR, seconds / peak) for seconds in row])
+                for day, row in enumerate(self.heatmap)]
+
+
+def _epoch_day(number):
+    return datetime.date(1970, 1, 1) + datetime.timedelta(days=int(number))
+
+
+def _load(start_date, end_date, task_name, start_before=None):
+    """Liest task_id, start, duration_sec der gefilterten Sessions hintereinander in ein array('q')."""
+    cur = session_rows("s.task_id, s.start, s.duration_sec", start_date, end_date, task_name, start_before)
+    flat = array("q")
+    while True:
+        rows = cur.fetchmany(LOAD_CHUNK_SIZE)
+        if not rows:
+            return flat
+        flat.extend(chain.from_iterable(rows))
+
+
+def _utc_offset(hour):
+    """Abstand der lokalen Zeit zu UTC (Sekunden) zu Beginn der Stunde 'hour' seit Epoch."""
+    return time.localtime(hour * HOUR).tm_gmtoff
+
+
+# --- NumPy ---
+
+def _analyse_numpy(flat):
+    rows = np.frombuffer(flat, dtype=np.int64).reshape(-1, 3)
+    task_id, start, duration = rows[:, 0], rows[:, 1], rows[:, 2]
+
+    # Lokale Zeit: Offset nur einmal je vorkommender Stunde bestimmen (Sommerzeit).
+    # Die Sessions kommen nach start sortiert, gleiche Stunden liegen also beieinander.
+    hours = start // HOUR
+    new_hour = np.ones(len(hours), dtype=bool)
+    new_hour[1:] = hours[1:] != hours[:-1]
+    offsets = np.fromiter((_utc_offset(int(hour)) for hour in hours[new_hour]), dtype=np.int64,
+                          count=int(np.count_nonzero(new_hour)))
+    local = start + offsets[np.cumsum(new_hour) - 1]
+
+    # Heatmap: Belegung je Sekunde der Woche über Differenzen und kumulierte Summe
+    pos = (local + EPOCH_WEEKDAY * DAY) % WEEK
+    weeks, rest = np.divmod(duration, WEEK)
+    end = pos + rest
+    wrap = end > WEEK
+    diff = np.bincount(pos, minlength=WEEK + 1)
+    diff -= np.bincount(np.where(wrap, end - WEEK, end), minlength=WEEK + 1)
+    diff[0] += np.count_nonzero(wrap)
+    coverage = np.cumsum(diff[:WEEK])
+    heatmap = coverage.reshape(7, 24, HOUR).sum(axis=2) + int(weeks.sum()) * HOUR
+
+    # Anteile je Task (Task-IDs sind kleine positive Zahlen, direkt als Index)
+    sums = np.bincount(task_id, weights=duration)
+    ids = np.flatnonzero(np.bincount(task_id))
+
+    # Aktive Tage: jede Session zählt für alle Tage, die sie berührt
+    first = local // DAY
+    span = (local + np.maximum(duration, 1) - 1) // DAY - first + 1
+    steps = np.arange(int(span.sum())) - np.repeat(np.cumsum(span) - span, span)
+    days = np.repeat(first, span) + steps
+    task_days = np.repeat(task_id, span)
+
+    task_streaks, _, _ = _runs_numpy(task_days, days, len(sums))
+    overall, streak_first, active_days = _runs_numpy(np.zeros(1, dtype=np.int64), days, 1)
+    return (heatmap.tolist(), ids.tolist(), sums[ids].astype(np.int64).tolist(), task_streaks[ids].tolist(),
+            active_days, int(overall[0]), streak_first)
+
+
+def _runs_numpy(groups, days, group_count):
+    """
+    Längste Folge aufeinanderfolgender Tage je Gruppe.
+
+    Liefert (Längen je Gruppe, erster Tag der längsten Folge der ersten
+    Gruppe, Anzahl verschiedener (Gruppe, Tag)).
+    """
+    base = int(days.min())
+    width = int(days.max()) - base + 2
+    # Sortieren und Duplikate verwerfen ist hier schneller als np.unique
+    keys = np.sort(groups * width + (days - base))
+    keys = keys[np.append(True, keys[1:] != keys[:-1])]
+    group, day = np.divmod(keys, width)
+    new = np.ones(len(keys), dtype=bool)
+    new[1:] = (group[1:] != group[:-1]) | (day[1:] != day[:-1] + 1)
+    starts = np.flatnonzero(new)
+    lengths = np.diff(np.append(starts, len(keys)))
+    best = np.zeros(group_count, dtype=np.int64)
+    np.maximum.at(best, group[starts], lengths)
+    longest = int(np.argmax(lengths))
+    return best, int(day[starts[longest]]) + base, len(keys)
+
+
+# --- array (ohne NumPy) ---
+
+def _analyse_array(flat):
+    task_id, start, duration = flat[0::3], flat[1::3], flat[2::3]
+
+    offsets = {}
+    local = array("q")
+    for value in start:
+        hour = value // HOUR
+        offset = offsets.get(hour)
+        if offset is None:
+            offset = offsets[hour] = _utc_offset(hour)
+        local.append(value + offset)
+
+    # Ohne Vektorisierung ist das sekundengenaue Wochenraster zu teuer;
+    # hier wird jede Session direkt auf die Stunden der Woche verteilt.
+    bins = [0] * (7 * 24)
+    full_weeks = 0
+    totals = {}
+    task_days = set()
+    for task, begin, seconds in zip(task_id, local, duration):
+        pos = (begin + EPOCH_WEEKDAY * DAY) % WEEK
+        weeks, rest = divmod(seconds, WEEK)
+        full_weeks += weeks
+        while rest > 0:
+            hour, into = divmod(pos, HOUR)
+            part = min(rest, HOUR - into)
+            bins[hour] += part
+            rest -= part
+            pos = (pos + part) % WEEK
+        totals[task] = totals.get(task, 0) + seconds
+        for day in range(begin // DAY, (begin + max(seconds, 1) - 1) // DAY + 1):
+            task_days.add((task, day))
+
+    heatmap = [[seconds + full_weeks * HOUR for seconds in bins[day * 24:(day + 1) * 24]] for day in range(7)]
+
+    ids = sorted(totals)
+    streaks = dict.fromkeys(ids, 0)
+    for task, length, _ in _runs_array(sorted(task_days)):
+        streaks[task] = max(streaks[task], length)
+    days = sorted({day for _, day in task_days})
+    overall, streak_first = max(((length, first) for _, length, first in _runs_array((0, day) for day in days)),
+                                key=lambda run: run[0])
+    return (heatmap, ids, [totals[task] for task in ids], [streaks[task] for task in ids],
+            len(days), overall, streak_first)
+
+
+def _runs_array(pairs):
+    """(Gruppe, Länge, erster Tag) für jede Folge aufeinanderfolgender Tage in sortierten (Gruppe, Tag)."""
+    current = None
+    for group, day in pairs:
+        if current is not None and current[0] == group and day == current[2] + current[1]:
+            current[1] += 1
+            continue
+        if current is not None:
+            yield current[0], current[1], current[2]
+        current = [group, 1, day]
+    if current is not None:
+        yield current[0], current[1], current[2]
+
+
+def analyse(start_date=None, end_date=None, task_name=None, start_before=None):
+    """
+    Wertet die gefilterten Sessions aus (Filter wie bei report) und liefert eine Utilisation.
+
+    start_before begrenzt wie bei iter_sessions auf Sessions, die vorher beginnen (Monatsteile von export-all).
+    """
+    flat = _load(start_date, end_date, task_name, start_before)
+    backend = "numpy" if np is not None else "array"
+    if not flat:
+        return Utilisation(0, 0, [[0] * 24 for _ in range(7)], [], 0, 0, None, backend)
+
+    analyse_rows = _analyse_numpy if np is not None else _analyse_array
+    heatmap, ids, totals, streaks, active_days, longest, streak_first = analyse_rows(flat)
+
+    names = dict(get_connection().execute("SELECT id, name FROM tasks"))
+    total = sum(totals)
+    tasks = sorted((TaskShare(names.get(task, str(task)), seconds, seconds / total if total else 0.0, streak)
+                    for task, seconds, streak in zip(ids, totals, streaks)),
+                   key=lambda share: (-share.total_sec, share.name))
+    return Utilisation(len(flat) // 3, total, heatmap, tasks, active_days, longest,
+                       _epoch_day(streak_first), backend)
+
+
+def report_heatmap(start_date=None, end_date=None, task_name=None, output_func=print):
+    """Gibt Heatmap (Stunden je Wochentag × Stunde), Anteile und Serien als Text aus."""
+    result = analyse(start_date, end_date, task_name)
+    if not result.sessions:
+        output_func("Keine Sitzungen gefunden.")
+        return
+
+    peak = result.peak or 1
+    output_func(f"Auslastung ({result.sessions} Sessions, {result.total_sec / HOUR:.1f} h):")
+    output_func("    " + "".join(f"{hour:02d} " for hour in range(24)) + "   Summe")
+    for label, row in zip(WEEKDAYS, result.heatmap):
+        cells = "".join(TEXT_LEVELS[round(seconds / peak * (len(TEXT_LEVELS) - 1))] * 2 + " " for seconds in row)
+        output_func(f"{label}  {cells}{sum(row) / HOUR:7.1f} h")
+    output_func(f"Skala: '{TEXT_LEVELS[1]}' bis '{TEXT_LEVELS[-1]}' = {peak / HOUR:.1f} h je Stunde und Wochentag")
+
+    output_func("Anteile:")
+    for share in result.tasks[:TASKS_SHOWN]:
+        output_func(f"  {share.name}: {share.total_sec / HOUR:.1f} h ({share.share * 100:.1f} %), "
+                    f"längste Serie {share.longest_streak} Tag(e)")
+    if len(result.tasks) > TASKS_SHOWN:
+        output_func(f"  ... {len(result.tasks) - TASKS_SHOWN} weitere")
+    output_func(f"Aktive Tage: {result.active_days}, längste Serie: {result.longest_streak} Tag(e) "
+                f"({result.streak_start} bis {result.streak_end})")
@@ -0,0 +1,7 @@
+# benchmarks/__init__.py
+"""
+Benchmarks für das Task- und Zeiterfassungstool.
+
+Aufruf aus dem Programmverzeichnis, z. B.:
+    python -m benchmarks.importtime
+"""
@@ -0,0 +1,97 @@
+# benchmarks/datagen.py
+"""
+Erzeugt reproduzierbare Datenbanken mit großer Historie für Benchmarks.
+
+Beispiel (aus dem Programmverzeichnis):
+    python -m benchmarks.datagen bench.db --tasks 2000 --sessions 1000000
+Gleiche Parameter und gleicher Seed ergeben immer dieselbe Datenbank.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+import db
+
+# Zeitraum, über den sich die Sessions verteilen
+DEFAULT_START = datetime.datetime(2020, 1, 1)
+DEFAULT_DAYS = 3 * 365
+
+INSERT_CHUNK_SIZE = 50000
+
+
+def task_name(number):
+    return f"task-{number:05d}"
+
+
+def generate(db_path, tasks=2000, sessions=1_000_000, seed=42,
+             start=DEFAULT_START, days=DEFAULT_DAYS, output_func=print):
+    """
+    Legt eine neue Datenbank unter db_path an und füllt sie.
+
+    Die Sessions liegen chronologisch hintereinander (wie im echten Betrieb),
+    Dauer 5 Minuten bis 3 Stunden, Tasks zufällig mit leichter Häufung
+    auf die ersten Tasks. Die Tagessummen werden am Ende neu aufgebaut.
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+
+    rng = random.Random(seed)
+    db.DB_NAME = db_path
+    db.init_db()
+    conn = db.get_connection()
+    started = time.perf_counter()
+
+    conn.executemany(
+        "INSERT INTO tasks (name, is_running, current_start, minimum_minutes) VALUES (?, 0, NULL, ?)",
+        ((task_name(i), rng.choice((0, 0, 0, 5, 15))) for i in range(tasks))
+    )
+    task_ids = [row[0] for row in conn.execute("SELECT id FROM tasks ORDER BY id")]
+
+    mean_gap = days * 86400 / max(sessions, 1)
+    current = start.timestamp()
+    chunk = []
+    for _ in range(sessions):
+        current += rng.expovariate(1 / mean_gap)
+        duration = rng.randint(5 * 60, 3 * 3600)
+        # Dreiecksverteilung: frühe Tasks kommen häufiger vor
+        task_id = task_ids[int(rng.triangular(0, len(task_ids), 0))]
+        session_start = int(current)
+        chunk.append((task_id, session_start, session_start + duration, duration))
+        if len(chunk) >= INSERT_CHUNK_SIZE:
+            conn.executemany(
+                "INSERT INTO sessions (task_id, start, end, duration_sec) VALUES (?, ?, ?, ?)", chunk
+            )
+            chunk = []
+    if chunk:
+        conn.executemany(
+            "INSERT INTO sessions (task_id, start, end, duration_sec) VALUES (?, ?, ?, ?)", chunk
+        )
+    conn.commit()
+    db.rebuild_rollup(output_func=lambda line: None)
+
+    elapsed = time.perf_counter() - started
+    output_func(f"{db_path}: {tasks} Tasks, {sessions} Sessions in {elapsed:.1f} s erzeugt (Seed {seed}).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark-Datenbank erzeugen")
+    parser.add_argument("path", help="Pfad der neuen Datenbank")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Zeitraum in Tagen ab 2020-01-01")
+    args = parser.parse_args(argv)
+
+    try:
+        generate(args.path, tasks=args.tasks, sessions=args.sessions, seed=args.seed, days=args.days)
+    except FileExistsError:
+        print(f"Die Datei '{args.path}' existiert bereits.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# benchmarks/importtime.py
+"""
+Prüft den Kaltstart der CLI mit 'python -X importtime'.
+
+Der CLI-Pfad (main -> commands -> db) darf weder GUI- noch Template-Pakete
+laden und muss innerhalb des Zeitbudgets importiert sein.
+Rückgabewert 1, wenn eine der Bedingungen verletzt ist.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Module, die erst bei 'gui' bzw. 'export' geladen werden dürfen
+FORBIDDEN_MODULES = ("tkinter", "PIL", "pystray", "jinja2")
+
+# Standardbudget für den kumulierten Import von 'main' in Millisekunden
+DEFAULT_BUDGET_MS = 60.0
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_imports(module="main"):
+    """
+    Importiert 'module' in einem frischen Interpreter.
+
+    Liefert ein Dict {Modulname: kumulierte Importzeit in ms}.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative) / 1000
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CLI-Kaltstart per -X importtime prüfen")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Budget für 'import main' (Standard: {DEFAULT_BUDGET_MS} ms)")
+    parser.add_argument("--runs", type=int, default=5, help="Anzahl Messungen (Minimum zählt)")
+    args = parser.parse_args(argv)
+
+    runs = [measure_imports() for _ in range(args.runs)]
+    best = min(runs, key=lambda timings: timings["main"])
+
+    failed = False
+    loaded = sorted(name for name in best if name.split(".")[0] in FORBIDDEN_MODULES)
+    if loaded:
+        print(f"FEHLER: CLI-Pfad lädt {', '.join(loaded)}")
+        failed = True
+
+    total = best["main"]
+    print(f"import main: {total:.1f} ms (Budget: {args.budget_ms:.1f} ms)")
+    for name, ms in sorted(best.items(), key=lambda item: item[1], reverse=True)[1:6]:
+        print(f"  {name}: {ms:.1f} ms")
+    if total > args.budget_ms:
+        print("FEHLER: Budget überschritten")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
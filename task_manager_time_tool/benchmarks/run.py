@@ -0,0 +1,310 @@
+# benchmarks/run.py
+"""
+Misst die Einstiegspunkte von db.py und die Befehlsverteilung über handle_command.
+
+Beispiel (aus dem Programmverzeichnis):
+    python -m benchmarks.datagen bench.db
+    python -m benchmarks.run bench.db --output results.json
+
+Gemessen wird auf einer Kopie der Datenbank, die Ausgangsdatei bleibt unverändert.
+Das Ergebnis ist JSON (Standardausgabe oder --output), eine Übersicht geht auf stderr.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+import db
+from commands import handle_command, complete_word
+
+
+def discard(line):
+    """Ausgabe-Senke: gemessen wird die Datenbankarbeit, nicht das Schreiben."""
+
+
+class Runner:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def bench(self, name, func, number=1, repeat=None, setup=None):
+        """
+        Führt func() 'repeat'-mal aus (setup() jeweils vorher, ungemessen).
+
+        'number' gibt an, wie viele Operationen ein Aufruf von func() enthält.
+        """
+        timings = []
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        result = {
+            "name": name,
+            "repeat": len(timings),
+            "number": number,
+            "min_ms": round(min(timings), 3),
+            "median_ms": round(statistics.median(timings), 3),
+            "max_ms": round(max(timings), 3),
+            "per_op_us": round(min(timings) * 1000 / number, 3),
+        }
+        self.results.append(result)
+        print(f"{name:<28} min {result['min_ms']:>10.3f} ms   median {result['median_ms']:>10.3f} ms",
+              file=sys.stderr)
+        return result
+
+    def skip(self, name, reason):
+        self.results.append({"name": name, "skipped": reason})
+        print(f"{name:<28} übersprungen: {reason}", file=sys.stderr)
+
+
+def copy_database(source, target):
+    """Kopiert die Datenbank per Backup-API (inklusive WAL-Inhalt)."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    with dst:
+        src.backup(dst)
+    src.close()
+    dst.close()
+
+
+def sample_filters(conn):
+    """Wählt einen Monat aus der Mitte der Historie und einen häufigen Task."""
+    count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    if not count:
+        raise SystemExit("Die Datenbank enthält keine Sessions (siehe benchmarks.datagen).")
+    middle = conn.execute(
+        "SELECT start FROM sessions ORDER BY start LIMIT 1 OFFSET ?", (count // 2,)
+    ).fetchone()[0]
+    # Filter wie von commands.py: Epoch-Sekunden der Monatsgrenzen (lokale Zeit)
+    month_start = datetime.datetime.fromtimestamp(middle).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
+    task = conn.execute("SELECT name FROM tasks ORDER BY id LIMIT 1").fetchone()[0]
+    after = conn.execute(
+        "SELECT id FROM sessions ORDER BY start, id LIMIT 1 OFFSET ?", (count // 2,)
+    ).fetchone()[0]
+    return {
+        "start_date": int(month_start.timestamp()), "end_date": int(next_month.timestamp()),
+        "task_name": task, "after": after, "sessions": count,
+    }
+
+
+def run_all(runner, workdir, full=False):
+    conn = db.get_connection()
+    f = sample_filters(conn)
+    month = {"start_date": f["start_date"], "end_date": f["end_date"]}
+
+    # --- Berichte (ohne Berichts-Cache, außer bei *_cached) ---
+    uncached = db.clear_report_cache
+    runner.bench("report_page", lambda: db.report_tasks_filtered(output_func=discard, limit=100), setup=uncached)
+    runner.bench("report_page_keyset", lambda: db.report_tasks_filtered(
+        output_func=discard, limit=100, after=f["after"]), setup=uncached)
+    runner.bench("report_month", lambda: db.report_tasks_filtered(output_func=discard, **month), setup=uncached)
+    runner.bench("report_month_cached", lambda: db.report_tasks_filtered(output_func=discard, **month))
+    runner.bench("report_task", lambda: db.report_tasks_filtered(
+        output_func=discard, task_name=f["task_name"]), setup=uncached)
+    if full:
+        runner.bench("report_full", lambda: db.report_tasks_filtered(output_func=discard), repeat=1)
+    for group, (_, key) in db.ROLLUP_GROUPS.items():
+        runner.bench(f"report_group_{group}", lambda group=group: db.report_rollup(group, output_func=discard))
+        runner.bench(f"report_group_{group}_task", lambda group=group: db.report_rollup(
+            group, task_name=f["task_name"], output_func=discard))
+        # Vergleich: dieselbe Summe direkt aus sessions statt aus den Tagessummen
+        runner.bench(f"sessions_group_{group}", lambda key=key: conn.execute(f"""
+            SELECT {key} AS grp, SUM(r.total_sec), SUM(r.count)
+            FROM (SELECT task_id, {db.ROLLUP_DAY_SQL} AS day, duration_sec AS total_sec, 1 AS count
+                  FROM sessions) r
+            JOIN tasks t ON t.id = r.task_id
+            GROUP BY grp ORDER BY grp
+        """).fetchall())
+
+    # --- Auslastung (analytics mit NumPy, sonst array) ---
+    import analytics
+    backend = "numpy" if analytics.np is not None else "array"
+    runner.bench(f"analytics_month_{backend}", lambda: analytics.analyse(**month))
+    runner.bench(f"analytics_full_{backend}", lambda: analytics.analyse(), repeat=1 if backend == "array" else None)
+
+    # --- Export ---
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        runner.skip("export_html_month", "jinja2 nicht installiert")
+    else:
+        export_path = os.path.join(workdir, "report.html")
+
+        def remove_export():
+            if os.path.exists(export_path):
+                os.remove(export_path)
+
+        def export_month():
+            db.export_report_to_html(export_path, output_func=discard, **month)
+
+        runner.bench("export_html_month", export_month, setup=lambda: (remove_export(), uncached()))
+        # wie nach einem report mit denselben Filtern
+        runner.bench("export_html_month_cached", export_month, setup=remove_export)
+
+        export_dir = os.path.join(workdir, "export-all")
+
+        def remove_export_dir():
+            if os.path.isdir(export_dir):
+                shutil.rmtree(export_dir)
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+            runner.bench(f"export_all_month_w{workers}",
+                         lambda workers=workers: db.export_all_reports(
+                             export_dir, "month", workers=workers, output_func=discard),
+                         setup=remove_export_dir, repeat=1)
+
+    for name in ("report.csv", "report.ndjson.gz"):
+        path = os.path.join(workdir, name)
+        fmt = db.export_format_for_path(path)
+        runner.bench(f"export_{fmt}{'_gz' if name.endswith('.gz') else ''}_full",
+                     lambda path=path, fmt=fmt: db.export_sessions(path, fmt, output_func=discard),
+                     setup=lambda path=path: os.path.exists(path) and os.remove(path), repeat=1)
+
+    # --- Schreibpfade ---
+    db.add_task("bench-toggle", output_func=discard)
+
+    def toggles():
+        for _ in range(100):
+            db.start_task("bench-toggle", output_func=discard)
+            db.stop_task("bench-toggle", output_func=discard)
+
+    runner.bench("start_stop_toggle", toggles, number=200)
+
+    def create_victim():
+        db.add_task("bench-delete", output_func=discard)
+        task_id = db.get_task("bench-delete").id
+        conn.executemany(
+            "INSERT INTO sessions (task_id, start, end, duration_sec) VALUES (?, ?, ?, 60)",
+            ((task_id, f["start_date"], f["start_date"]) for _ in range(10000))
+        )
+        conn.commit()
+
+    runner.bench("delete_task_10k_sessions",
+                 lambda: db.delete_task("bench-delete", output_func=discard), setup=create_victim)
+
+    # --- Sammelbefehle mit Glob-Muster (eine Transaktion für 1000 Tasks) ---
+    def create_bulk():
+        conn.executemany("INSERT OR IGNORE INTO tasks (name) VALUES (?)",
+                         ((f"bench-bulk-{number:04d}",) for number in range(1000)))
+        conn.commit()
+        db.reset_task_names()
+
+    create_bulk()
+    runner.bench("bulk_start_stop_1000", lambda: (db.start_tasks("bench-bulk-*", output_func=discard),
+                                                  db.stop_tasks("bench-bulk-*", output_func=discard)),
+                 number=2000)
+    runner.bench("bulk_delete_1000", lambda: db.delete_tasks("bench-bulk-*", output_func=discard),
+                 setup=create_bulk)
+
+    # --- Laufzeit-Anzeige (Sekundentakt der GUI, nur Speicherstand) ---
+    for number in range(50):
+        db.add_task(f"bench-running-{number}", output_func=discard)
+        db.start_task(f"bench-running-{number}", output_func=discard)
+
+    def elapsed_labels():
+        now = time.time()
+        return " | ".join(f"{name} {db.format_elapsed(now - start)}"
+                          for name, start in sorted(db.running_tasks().items()))
+
+    runner.bench("running_elapsed_labels_50", elapsed_labels, number=1, repeat=max(runner.repeat, 100))
+
+    # --- Befehlsverteilung ---
+    runner.bench("dispatch_list", lambda: handle_command("list", output_func=discard))
+    runner.bench("dispatch_report_page", lambda: handle_command("report limit=100", output_func=discard))
+    runner.bench("dispatch_unknown", lambda: handle_command("nix", output_func=discard))
+
+    # --- Archiv (verschiebt alles vor dem Beispielmonat, Kopie bleibt danach archiviert) ---
+    runner.bench("archive_before_month",
+                 lambda: db.archive_sessions(f["start_date"], output_func=discard), repeat=1)
+    year_ago = {key: value - 365 * 86400 for key, value in month.items()}
+    runner.bench("report_month_hot", lambda: db.report_tasks_filtered(output_func=discard, **month),
+                 setup=uncached)
+    runner.bench("report_month_archived", lambda: db.report_tasks_filtered(output_func=discard, **year_ago),
+                 setup=uncached)
+    runner.bench("report_page_archived", lambda: db.report_tasks_filtered(output_func=discard, limit=100),
+                 setup=uncached)
+
+    # --- GUI-Pfad (ohne Fenster) ---
+    try:
+        from gui import TaskGUI
+    except Exception as e:
+        runner.skip("gui_get_tasks", f"GUI nicht verfügbar ({type(e).__name__})")
+        runner.skip("gui_tray_menu", f"GUI nicht verfügbar ({type(e).__name__})")
+    else:
+        # create_tray_menu braucht nur get_tasks, executor und _open_callback
+        fake_gui = types.SimpleNamespace(executor=None, _open_callback=None, _tray_label=TaskGUI._tray_label)
+        fake_gui.get_tasks = lambda: TaskGUI.get_tasks(fake_gui)
+        runner.bench("gui_get_tasks", fake_gui.get_tasks)
+        runner.bench("gui_tray_menu", lambda: TaskGUI.create_tray_menu(fake_gui))
+
+    # --- Namensindex (zuletzt, da 100k zusätzliche Tasks alle anderen Messungen verfälschen) ---
+    conn.executemany("INSERT INTO tasks (name) VALUES (?)",
+                     ((f"bench-name-{number:06d}",) for number in range(100000)))
+    conn.commit()
+    runner.bench("task_names_load_100k", lambda: (db.reset_task_names(), db.task_names()), repeat=3)
+    runner.bench("complete_task_prefix_100k",
+                 lambda: [db.complete_task_names(prefix) for prefix in ("bench-name-0", "bench-name-0999", "x")],
+                 number=3, repeat=max(runner.repeat, 100))
+    runner.bench("complete_line_100k", lambda: complete_word("report task=bench-name-05"),
+                 repeat=max(runner.repeat, 100))
+    runner.bench("suggest_task_100k", lambda: db.suggest_task_names("bench-name-0o1234"),
+                 repeat=max(runner.repeat, 10))
+
+    return f
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="db.py- und Dispatch-Benchmarks")
+    parser.add_argument("database", help="Datenbank aus benchmarks.datagen")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--full", action="store_true", help="auch den kompletten Bericht messen")
+    parser.add_argument("--output", help="JSON-Ergebnis in diese Datei schreiben")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"Datenbank '{args.database}' wurde nicht gefunden.", file=sys.stderr)
+        return 1
+
+    runner = Runner(args.repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        db.DB_NAME = os.path.join(workdir, "bench.db")
+        copy_database(args.database, db.DB_NAME)
+        db.init_db()
+        filters = run_all(runner, workdir, full=args.full)
+        db.close_connection()
+
+    report = {
+        "meta": {
+            "database": os.path.abspath(args.database),
+            "sessions": filters["sessions"],
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": runner.results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
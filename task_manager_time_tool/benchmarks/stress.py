@@ -0,0 +1,146 @@
+# benchmarks/stress.py
+"""
+Mehrere Prozesse starten und stoppen gleichzeitig dieselben Tasks.
+
+Beispiel (aus dem Programmverzeichnis):
+    python -m benchmarks.stress --processes 8 --tasks 4 --ops 500
+
+Jeder Prozess verhält sich wie eine eigene GUI- oder CLI-Instanz (eigene
+Verbindung) und schaltet zufällige Tasks um. Danach wird geprüft:
+  - jeder erfolgreiche Stopp hat genau eine Session erzeugt,
+  - erfolgreiche Starts minus Stopps ergeben den Endzustand je Task
+    (kein doppelter Start),
+  - Sessions eines Tasks überschneiden sich nicht,
+  - die Tagessummen passen zu den Sessions,
+  - kein Vorgang ist mit 'database is locked' gescheitert.
+Der Exit-Code ist 1, wenn eine Prüfung fehlschlägt.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import db
+
+
+def discard(line):
+    """Ausgabe-Senke für die Meldungen von start_task/stop_task."""
+
+
+def task_name(number):
+    return f"stress-{number:02d}"
+
+
+def worker(db_path, tasks, ops, seed):
+    """Schaltet 'ops'-mal einen zufälligen Task um; liefert Zähler je Task und die Fehler."""
+    db.DB_NAME = db_path
+    rng = random.Random(seed)
+    starts = [0] * tasks
+    stops = [0] * tasks
+    errors = []
+    for _ in range(ops):
+        number = rng.randrange(tasks)
+        func = db.start_task if rng.random() < 0.5 else db.stop_task
+        try:
+            if func(task_name(number), output_func=discard):
+                (starts if func is db.start_task else stops)[number] += 1
+        except sqlite3.Error as e:
+            errors.append(f"{func.__name__}({task_name(number)}): {e}")
+    db.close_connection()
+    return starts, stops, errors
+
+
+def check(db_path, tasks, starts, stops, errors, output_func=print):
+    """Prüft die Datenbank gegen die Zähler der Prozesse; liefert die Anzahl der Verstöße."""
+    conn = sqlite3.connect(db_path)
+    failures = 0
+
+    def fail(message):
+        nonlocal failures
+        failures += 1
+        output_func(f"FEHLER: {message}")
+
+    for error in errors[:10]:
+        fail(error)
+    if len(errors) > 10:
+        fail(f"... {len(errors) - 10} weitere Fehler")
+
+    sessions = dict(conn.execute("""
+        SELECT t.name, COUNT(s.id) FROM tasks t LEFT JOIN sessions s ON s.task_id = t.id GROUP BY t.id
+    """).fetchall())
+    running = dict(conn.execute("SELECT name, is_running FROM tasks").fetchall())
+    for number in range(tasks):
+        name = task_name(number)
+        if sessions.get(name, 0) != stops[number]:
+            fail(f"{name}: {stops[number]} Stopps, aber {sessions.get(name, 0)} Sessions")
+        if starts[number] - stops[number] != running.get(name):
+            fail(f"{name}: {starts[number]} Starts, {stops[number]} Stopps, is_running={running.get(name)}")
+
+    overlaps = conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT start, LAG(end) OVER (PARTITION BY task_id ORDER BY start, id) AS previous_end
+            FROM sessions
+        ) WHERE start < previous_end
+    """).fetchone()[0]
+    if overlaps:
+        fail(f"{overlaps} überlappende Sessions")
+
+    rollup = conn.execute("SELECT COALESCE(SUM(count), 0), COALESCE(SUM(total_sec), 0) FROM session_rollup").fetchone()
+    totals = conn.execute("SELECT COUNT(*), COALESCE(SUM(duration_sec), 0) FROM sessions").fetchone()
+    if rollup != totals:
+        fail(f"Tagessummen {rollup} passen nicht zu den Sessions {totals}")
+
+    conn.close()
+    return failures
+
+
+def run(db_path, processes, tasks, ops, seed=42, output_func=print):
+    db.DB_NAME = db_path
+    db.init_db()
+    for number in range(tasks):
+        db.add_task(task_name(number), output_func=discard)
+    db.close_connection()
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(worker, [(db_path, tasks, ops, seed + index) for index in range(processes)])
+    elapsed = time.perf_counter() - started
+
+    starts = [sum(counts) for counts in zip(*(result[0] for result in results))]
+    stops = [sum(counts) for counts in zip(*(result[1] for result in results))]
+    errors = [error for result in results for error in result[2]]
+
+    total = processes * ops
+    output_func(f"{processes} Prozesse x {ops} Vorgänge auf {tasks} Tasks: {total} in {elapsed:.2f} s "
+                f"({total / elapsed:.0f}/s), {sum(starts)} Starts, {sum(stops)} Stopps erfolgreich.")
+    failures = check(db_path, tasks, starts, stops, errors, output_func)
+    output_func("OK" if not failures else f"{failures} Prüfung(en) fehlgeschlagen.")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start/Stop-Stresstest mit mehreren Prozessen")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=4, help="wenige Tasks erzwingen Konflikte")
+    parser.add_argument("--ops", type=int, default=500, help="Vorgänge je Prozess")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="Datenbank behalten (neue Datei) statt temporär")
+    args = parser.parse_args(argv)
+
+    if args.database:
+        if os.path.exists(args.database):
+            print(f"Die Datei '{args.database}' existiert bereits.")
+            return 1
+        return 1 if run(args.database, args.processes, args.tasks, args.ops, args.seed) else 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        failures = run(os.path.join(workdir, "stress.db"), args.processes, args.tasks, args.ops, args.seed)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,129 +1,440 @@
 # commands.py
+"""
+Befehlsregister für CLI, Shell, Server und GUI.
+
+Jeder Befehl wird mit @command registriert und beschreibt seine Argumente
+deklarativ (Arg). Zerlegen, Umwandeln (Datum, Zahl, Auswahl) und die
+Syntax-/Hilfetexte kommen dadurch für alle Oberflächen aus einer Stelle.
+"""
 from db import (
     add_task,
     start_task,
     stop_task,
     delete_task,
-    list_tasks,
+    start_tasks,
+    stop_tasks,
+    delete_tasks,
+    is_task_pattern,
+    match_tasks,
+    format_task_list,
+    task_exists,
+    iter_tasks,
+    import_sessions,
     report_tasks_filtered,
+    report_rollup,
+    rebuild_rollup,
     export_report_to_html,
+    export_sessions,
+    export_format_for_path,
+    export_all_reports,
+    archive_sessions,
+    format_timestamp,
+    format_elapsed,
+    complete_task_names,
+    ROLLUP_GROUPS,
+    EXPORT_FORMATS,
+    EXPORT_SPLITS,
+    ArchiveMissingError,
 )
-from datetime import datetime
+from datetime import datetime, timedelta
+import time
+import stats
 
-def handle_command(command_line, output_func=print):
+def parse_date_arg(value, is_end=False):
+    """
+    Wandelt ein Datumsargument (YYYY-MM-DD oder YYYY-MM-DDTHH:MM[:SS]) in
+    Epoch-Sekunden (lokale Zeit) um. Ein reines Datum als Ende schließt den
+    ganzen Tag ein, es zählt also bis zum Beginn des Folgetags.
+    Wirft ValueError bei ungültiger Eingabe.
+    """
+    moment = datetime.fromisoformat(value)
+    if is_end and len(value) == 10:
+        moment += timedelta(days=1)
+    return int(moment.timestamp())
+
+
+class UsageError(ValueError):
+    """Ungültige Befehlsargumente; die Meldung wird so ausgegeben."""
+
+
+class Arg:
+    """
+    Deklarative Beschreibung eines Befehlsarguments.
+
+    Positionsargumente werden der Reihe nach belegt, Optionen (option=True)
+    als name=wert angegeben. 'convert' wandelt den Text um und wirft
+    ValueError bei ungültigen Werten; 'dest' ist der Parametername im Handler.
+    """
+    __slots__ = ("name", "placeholder", "option", "required", "convert", "choices", "dest")
+
+    def __init__(self, name, placeholder=None, option=False, required=False, convert=None,
+                 choices=None, dest=None):
+        self.name = name
+        self.placeholder = placeholder or name
+        self.option = option
+        self.required = required
+        self.convert = convert
+        self.choices = tuple(choices) if choices is not None else None
+        self.dest = dest or name
+
+    def usage(self):
+        if self.choices:
+            value = "|".join(self.choices)
+        elif self.option and self.placeholder == self.name:
+            value = ".."
+        elif self.option or self.required:
+            value = f"<{self.placeholder}>"
+        else:
+            value = self.placeholder
+        if self.option:
+            return f"{self.name}={value}"
+        return value if self.required else f"[{value}]"
+
+    def parse(self, value):
+        if self.choices is not None and value not in self.choices:
+            raise UsageError(f"Ungültiger Wert für {self.name}: {value} (erlaubt: {'|'.join(self.choices)})")
+        if self.convert is None:
+            return value
+        try:
+            return self.convert(value)
+        except UsageError:
+            raise
+        except ValueError:
+            raise UsageError(f"Ungültiger Wert für {self.name}: {value}") from None
+
+
+def _date(value):
+    try:
+        return parse_date_arg(value)
+    except ValueError:
+        raise UsageError(f"Ungültiges Datum: {value} (erwartet YYYY-MM-DD)") from None
+
+def _end_date(value):
+    try:
+        return parse_date_arg(value, is_end=True)
+    except ValueError:
+        raise UsageError(f"Ungültiges Datum: {value} (erwartet YYYY-MM-DD)") from None
+
+def _positive_int(value):
+    return max(int(value), 1)
+
+# Gemeinsame Filter für report, export und export-all
+FILTER_ARGS = (
+    Arg("start", option=True, convert=_date, dest="start_date"),
+    Arg("end", option=True, convert=_end_date, dest="end_date"),
+    Arg("task", option=True, dest="task_name"),
+)
+
+
+class Command:
+    """Ein registrierter Befehl: Handler, Argument-Specs und Kurzbeschreibung."""
+    __slots__ = ("name", "func", "args", "summary")
+
+    def __init__(self, name, func, args, summary):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.summary = summary
+
+    def usage(self):
+        parts = [self.name]
+        parts.extend(arg.usage() for arg in self.args if not arg.option)
+        parts.extend(arg.usage() for arg in self.args if arg.option and arg.required)
+        optional = [arg.usage() for arg in self.args if arg.option and not arg.required]
+        if optional:
+            parts.append(f"[{' '.join(optional)}]")
+        return " ".join(parts)
+
+    def parse(self, args, output_func=print):
+        """
+        Ordnet die Argumente den Specs zu und liefert die Handler-Parameter.
+
+        name=wert zählt als Option, wenn der Befehl eine Option 'name' kennt,
+        sonst als nächstes Positionsargument. Überzählige Argumente werden
+        gemeldet und ignoriert; ungültige oder fehlende werfen UsageError.
+        """
+        positional = [arg for arg in self.args if not arg.option]
+        options = {arg.name: arg for arg in self.args if arg.option}
+        values = {}
+        index = 0
+        for text in args:
+            key, sep, value = text.partition("=")
+            if sep and key in options:
+                values[options[key].dest] = options[key].parse(value)
+            elif index < len(positional):
+                values[positional[index].dest] = positional[index].parse(text)
+                index += 1
+            else:
+                output_func(f"Unbekanntes Argument: {text}")
+
+        for arg in self.args:
+            if arg.required and arg.dest not in values:
+                raise UsageError(f"Syntax: {self.usage()}")
+        return values
+
+    def run(self, args, output_func=print):
+        try:
+            values = self.parse(args, output_func)
+        except UsageError as e:
+            output_func(str(e))
+            return None
+        return self.func(output_func, **values)
+
+
+# Alle Befehle in Registrierungsreihenfolge (auch die Reihenfolge der Hilfe)
+COMMANDS = {}
+
+def command(name, *args, summary):
+    """Dekorator: registriert func(output_func, **argumente) als Befehl 'name'."""
+    def register(func):
+        COMMANDS[name] = Command(name, func, args, summary)
+        return func
+    return register
+
+def split_command(command_line):
+    """Zerlegt eine Befehlszeile in (befehl, argumente); (None, []) bei Leerzeile."""
     parts = command_line.split()
     if not parts:
+        return None, []
+    return parts[0].lower(), parts[1:]
+
+def complete_word(line):
+    """
+    Vervollständigungen für das letzte Wort einer Befehlszeile (GUI und Shell).
+
+    Das erste Wort wird zu Befehlsnamen ergänzt, name=wert zu den erlaubten
+    Werten der Option bzw. bei task= zu Tasknamen, alle anderen Wörter zu
+    Tasknamen. Jeder Kandidat ersetzt das komplette letzte Wort.
+    """
+    words = line.split(" ")
+    word = words[-1]
+    if len(words) == 1:
+        return [name for name in COMMANDS if name.startswith(word.lower())]
+
+    key, sep, value = word.partition("=")
+    if not sep:
+        return complete_task_names(word)
+    if key == "task":
+        return [f"task={name}" for name in complete_task_names(value)]
+    spec = COMMANDS.get(words[0].lower())
+    for arg in spec.args if spec else ():
+        if arg.option and arg.name == key and arg.choices:
+            return [f"{key}={choice}" for choice in arg.choices if choice.startswith(value)]
+    return []
+
+def handle_command(command_line, output_func=print):
+    cmd, args = split_command(command_line)
+    if cmd is None:
         return
 
-    cmd = parts[0].lower()
-    args = parts[1:]
+    if not stats.ENABLED:
+        return _dispatch(cmd, args, output_func)
+    with stats.timer("command", cmd):
+        return _dispatch(cmd, args, output_func)
 
-    if cmd == "help":
-        show_help(output_func)
+def _dispatch(cmd, args, output_func):
+    spec = COMMANDS.get(cmd)
+    if spec is None:
+        output_func(f"Unbekannter Befehl: {cmd}")
+        return None
+    return spec.run(args, output_func)
 
-    elif cmd == "add":
-        if len(args) < 1:
-            output_func("Syntax: add <taskname> [minuten]")
-        else:
-            add_task(args[0], args[1] if len(args) > 1 else None, output_func)
 
-    elif cmd == "start":
-        if len(args) < 1:
-            output_func("Syntax: start <taskname>")
-        else:
-            start_task(args[0], output_func)
+@command("add", Arg("taskname", required=True), Arg("minuten", placeholder="min"),
+         summary="Neuer Task (min=1..60)")
+def _add(output_func, taskname, minuten=None):
+    add_task(taskname, minuten, output_func)
 
-    elif cmd == "stop":
-        if len(args) < 1:
-            output_func("Syntax: stop <taskname>")
-        else:
-            stop_task(args[0], output_func)
+# Mit Glob-Muster ('tmp-*', 'projekt-?') wirken start/stop/delete auf alle
+# passenden Tasks in einer Transaktion; 'stop all' stoppt alle laufenden.
+# Ein Task, der genau so heißt (auch 'all'), hat Vorrang vor dem Muster.
 
-    elif cmd == "delete":
-        if len(args) < 1:
-            output_func("Syntax: delete <taskname>")
-        else:
-            # Normalfall: CLI ruft delete_task direkt auf,
-            # aber in der GUI machen wir die Bestätigung anders.
-            delete_task(args[0], output_func=output_func, is_gui=False)
+@command("start", Arg("taskname", required=True), summary="Starte einen Task (oder alle zu einem Muster wie tmp-*)")
+def _start(output_func, taskname):
+    if is_task_pattern(taskname):
+        start_tasks(taskname, output_func)
+    else:
+        start_task(taskname, output_func)
 
-    elif cmd == "list":
-        list_tasks(output_func)
+@command("stop", Arg("taskname", required=True), summary="Stoppe einen Task (Muster wie tmp-* oder 'all')")
+def _stop(output_func, taskname):
+    if taskname == "all" and not task_exists(taskname):
+        stop_tasks("*", output_func)
+    elif is_task_pattern(taskname):
+        stop_tasks(taskname, output_func)
+    else:
+        stop_task(taskname, output_func)
 
-    elif cmd == "report":
-        if len(args) == 0:
-            report_tasks_filtered(output_func=output_func)
-        else:
-            start_date = None
-            end_date = None
-            task_name = None
-
-            for arg in args:
-                if arg.startswith("start="):
-                    start_date = arg.split("=")[1]
-                elif arg.startswith("end="):
-                    end_date = arg.split("=")[1]
-                elif arg.startswith("task="):
-                    task_name = arg.split("=")[1]
-                else:
-                    output_func(f"Unbekanntes Argument: {arg}")
-
-            report_tasks_filtered(start_date=start_date, end_date=end_date, task_name=task_name, output_func=output_func)
-
-    elif cmd == "export":
+@command("delete", Arg("taskname", required=True), Arg("bestätigung", choices=("--yes",), dest="confirmed"),
+         summary="Lösche einen Task (oder alle zu einem Muster wie tmp-*, nur mit --yes)")
+def _delete(output_func, taskname, confirmed=None):
+    # Normalfall: CLI ruft delete_task direkt auf,
+    # aber in der GUI machen wir die Bestätigung anders.
+    if is_task_pattern(taskname):
+        # Ohne Rückfrage (CLI, Batch, Server) nur mit ausdrücklichem --yes,
+        # denn ein Muster löscht alle passenden Tasks samt Sessions
+        if not confirmed:
+            names = match_tasks(taskname)
+            if not names:
+                output_func(f"Kein Task passt zu '{taskname}'.")
+            else:
+                output_func(f"'{taskname}' passt zu {len(names)} Task(s) ({format_task_list(names)}). "
+                            f"Zum Löschen samt Sessions: delete {taskname} --yes")
+            return
+        delete_tasks(taskname, output_func)
+    else:
+        delete_task(taskname, output_func=output_func, is_gui=False)
+
+@command("list", summary="Liste alle Tasks")
+def _list(output_func):
+    list_tasks(output_func)
+
+@command("import", Arg("datei", required=True), summary="Sessions aus CSV/NDJSON importieren")
+def _import(output_func, datei):
+    try:
+        import_sessions(datei, output_func=output_func)
+    except FileNotFoundError:
+        output_func(f"Datei '{datei}' wurde nicht gefunden.")
+    except UnicodeDecodeError:
+        output_func(f"Import abgebrochen: Datei '{datei}' ist nicht UTF-8-kodiert.")
+    except ValueError as e:
+        output_func(f"Import abgebrochen: {e}")
+
+@command("report", Arg("ansicht", choices=("heatmap",)), *FILTER_ARGS,
+         Arg("group", option=True, choices=ROLLUP_GROUPS),
+         Arg("limit", option=True, convert=_positive_int),
+         Arg("after", option=True, convert=int),
+         summary="Bericht anzeigen (seitenweise mit limit=/after=, Summen mit group=, Auslastung mit heatmap)")
+def _report(output_func, ansicht=None, start_date=None, end_date=None, task_name=None, group=None, limit=None,
+            after=None):
+    if ansicht == "heatmap":
+        # analytics (und ggf. numpy) erst hier laden, die CLI startet sonst langsamer
+        from analytics import report_heatmap
+        try:
+            report_heatmap(start_date=start_date, end_date=end_date, task_name=task_name, output_func=output_func)
+        except ArchiveMissingError as e:
+            output_func(f"Archivdatei '{e.filename}' wurde nicht gefunden.")
+        except ValueError as e:
+            output_func(str(e))
+        return None
+
+    if group:
+        report_rollup(group, start_date=start_date, end_date=end_date, task_name=task_name,
+                      output_func=output_func)
+        return None
+
+    # Rückgabe: Keyset-Position der nächsten Seite (nur mit limit=)
+    try:
+        return report_tasks_filtered(start_date=start_date, end_date=end_date, task_name=task_name,
+                                     output_func=output_func, limit=limit, after=after)
+    except ArchiveMissingError as e:
+        output_func(f"Archivdatei '{e.filename}' wurde nicht gefunden.")
+    except ValueError as e:
+        output_func(str(e))
+    return None
+
+@command("rollup", summary="Tagessummen für group-Berichte neu aufbauen")
+def _rollup(output_func):
+    try:
+        rebuild_rollup(output_func)
+    except ArchiveMissingError as e:
+        output_func(f"Archivdatei '{e.filename}' wurde nicht gefunden.")
+
+@command("archive", Arg("before", placeholder="datum", option=True, required=True, convert=_date),
+         summary="Ältere Sessions in Jahresarchive verschieben")
+def _archive(output_func, before):
+    archive_sessions(before, output_func=output_func)
+
+def _describe_filters(start_date, end_date, task_name):
+    return (f"Filter: start_date={format_timestamp(start_date) or None}, "
+            f"end_date={format_timestamp(end_date) or None}, task_name={task_name}")
+
+@command("export", Arg("path"), *FILTER_ARGS, Arg("format", option=True, choices=EXPORT_FORMATS, dest="fmt"),
+         summary="Bericht exportieren (HTML, CSV oder NDJSON, .gz komprimiert)")
+def _export(output_func, path=None, start_date=None, end_date=None, task_name=None, fmt=None):
+    # Format aus format= oder der Dateiendung, sonst HTML
+    fmt = fmt or (export_format_for_path(path) if path else None) or "html"
+    if path is None:
         # Standard-Pfad und Timestamp
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        output_path = f"./report_{timestamp}.html"
+        path = f"./report_{timestamp}{EXPORT_FORMATS[fmt]}"
+    if fmt == "html" and path.lower().endswith(".gz"):
+        output_func("Komprimierung (.gz) ist nur für format=csv|ndjson möglich.")
+        return
 
-        start_date = None
-        end_date = None
-        task_name = None
+    output_func(f"Exportiere Bericht nach: {path}")
+    output_func(_describe_filters(start_date, end_date, task_name))
 
-        # Prüfen, ob das erste Argument ein Pfad ist
-        if len(args) > 0 and not any(args[0].startswith(x) for x in ("start=", "end=", "task=")):
-            output_path = args[0]
-            remaining_args = args[1:]
+    try:
+        if fmt == "html":
+            export_report_to_html(path, start_date=start_date, end_date=end_date, task_name=task_name,
+                                  output_func=output_func)
         else:
-            remaining_args = args
-
-        for arg in remaining_args:
-            if arg.startswith("start="):
-                start_date = arg.split("=", 1)[1]
-            elif arg.startswith("end="):
-                end_date = arg.split("=", 1)[1]
-            elif arg.startswith("task="):
-                task_name = arg.split("=", 1)[1]
-            else:
-                output_func(f"Unbekanntes Argument: {arg}")
+            export_sessions(path, fmt, start_date=start_date, end_date=end_date, task_name=task_name,
+                            output_func=output_func)
+    except ArchiveMissingError as e:
+        output_func(f"Archivdatei '{e.filename}' wurde nicht gefunden.")
+    except Exception as e:
+        output_func(f"Fehler beim Export: {e}")
 
-        output_func(f"Exportiere Bericht nach: {output_path}")
-        output_func(f"Filter: start_date={start_date}, end_date={end_date}, task_name={task_name}")
+@command("export-all", Arg("verzeichnis", required=True), Arg("split", option=True, choices=EXPORT_SPLITS),
+         *FILTER_ARGS, Arg("workers", option=True, convert=_positive_int),
+         summary="HTML-Berichte je Task/Monat parallel erzeugen")
+def _export_all(output_func, verzeichnis, split="task", start_date=None, end_date=None, task_name=None,
+                workers=None):
+    try:
+        export_all_reports(verzeichnis, split, start_date=start_date, end_date=end_date, task_name=task_name,
+                           workers=workers, output_func=output_func)
+    except ArchiveMissingError as e:
+        output_func(f"Archivdatei '{e.filename}' wurde nicht gefunden.")
+    except Exception as e:
+        output_func(f"Fehler beim Export: {e}")
 
-        try:
-            export_report_to_html(output_path, start_date=start_date, end_date=end_date, task_name=task_name)
-        except Exception as e:
-            output_func(f"Fehler beim Export: {e}")
+@command("stats", Arg("aktion", choices=("on", "off", "reset", "show")),
+         summary="Laufzeitstatistik für Befehle und SQL")
+def _stats(output_func, aktion="show"):
+    if aktion == "on":
+        stats.enable()
+        output_func("Statistik eingeschaltet.")
+    elif aktion == "off":
+        stats.disable()
+        output_func("Statistik ausgeschaltet.")
+    elif aktion == "reset":
+        stats.reset()
+        output_func("Statistik zurückgesetzt.")
+    else:
+        stats.show_stats(output_func)
 
-    elif cmd == "collwin":
-        # Dieser Befehl soll im GUI eine Aktion auslösen,
-        # in der CLI nur eine Meldung ausgeben.
-        output_func("Dieser Befehl ist nur in der GUI verfügbar.")
+# page und collwin lösen in GUI bzw. Shell eine Aktion aus, dort werden sie
+# vor handle_command abgefangen; in der CLI gibt es nur eine Meldung.
+@command("page", summary="(GUI/Shell) Nächste Seite des letzten Berichts")
+def _page(output_func):
+    output_func("Dieser Befehl ist nur in der GUI und der Shell verfügbar.")
 
-    else:
-        output_func(f"Unbekannter Befehl: {cmd}")
+@command("collwin", summary="(Nur im GUI) Klappt das Fenster ein/aus")
+def _collwin(output_func):
+    output_func("Dieser Befehl ist nur in der GUI verfügbar.")
+
+@command("help", summary="Zeige diese Hilfe an")
+def _help(output_func):
+    show_help(output_func)
+
+
+def list_tasks(output_func=print):
+    """Gibt alle Tasks mit Status und Mindest-Minuten aus."""
+    empty = True
+    now = time.time()
+    for task in iter_tasks():
+        status = f"läuft seit {format_elapsed(now - task.current_start)}" if task.is_running else "inaktiv"
+        output_func(f"Task: {task.name}, Status: {status}, Mindest-Minuten: {task.minimum_minutes}")
+        empty = False
+
+    if empty:
+        output_func("Keine Tasks vorhanden.")
 
 
 def show_help(output_func=print):
-    help_text = (
-        "Verfügbare Befehle:\n"
-        "  add <taskname> [min]     - Neuer Task (min=1..60)\n"
-        "  start <taskname>         - Starte einen Task\n"
-        "  stop <taskname>          - Stoppe einen Task\n"
-        "  delete <taskname>        - Lösche einen Task\n"
-        "  list                     - Liste alle Tasks\n"
-        "  report [start=.. end=.. task=..] - Bericht anzeigen\n"
-        "  export <path> [start=.. end=.. task=..] - Bericht als HTML exportieren\n"
-        "  collwin                  - (Nur im GUI) Klappt das Fenster ein/aus\n"
-        "  help                     - Zeige diese Hilfe an\n"
-    )
-    output_func(help_text)
+    lines = ["Verfügbare Befehle:"]
+    for spec in COMMANDS.values():
+        lines.append(f"  {spec.usage():<24} - {spec.summary}")
+    output_func("\n".join(lines) + "\n")
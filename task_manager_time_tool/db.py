@@ -1,31 +1,524 @@
 # db.py
 import sqlite3
 import datetime
+import errno
 import os
-from jinja2 import Template
+import random
+import threading
+import functools
+import contextlib
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import chain
+
+import stats
 
 DB_NAME = "tasks.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS tasks (
+# Templates liegen neben dem Programm, nicht im aktuellen Arbeitsverzeichnis
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_TEMPLATE = "template_report.html"
+
+# Größe des Statement-Caches pro Verbindung (wiederverwendete Prepared Statements)
+STATEMENT_CACHE_SIZE = 256
+
+# Wartezeit auf die Schreibsperre eines anderen Prozesses/Threads (Sekunden)
+BUSY_TIMEOUT = 5.0
+
+# Wartezeit, wenn ein anderer Prozess gerade das Schema migriert (große
+# Datenbanken brauchen dafür deutlich länger als BUSY_TIMEOUT)
+MIGRATION_BUSY_TIMEOUT = 600.0
+
+# Wiederholungen einer Start/Stop-Transaktion, wenn die Datenbank trotzdem
+# gesperrt ist, mit exponentiell wachsender Pause (plus Zufallsanteil)
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.05
+
+# UPDATE/INSERT ... RETURNING gibt es ab SQLite 3.35
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Eine langlebige Verbindung pro Thread (GUI-Hauptthread, Tray-Thread, CLI)
+_local = threading.local()
+
+# Von einem geforkten Kindprozess geerbte Verbindungen (siehe _reset_after_fork)
+_inherited_connections = []
+
+# Laufende Tasks im Speicher: {Name: current_start} für DB_NAME (siehe running_tasks).
+# Wird nur per Copy-on-Write ersetzt, Leser brauchen daher keinen Lock.
+_running = None
+_running_db = None
+_running_lock = threading.Lock()
+
+# Sortierte Tasknamen für Vervollständigung und Vorschläge (siehe task_names)
+_names = None
+_names_db = None
+_names_lock = threading.Lock()
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """
+    Cursor, der bei eingeschalteter Statistik jedes Statement misst.
+
+    Gemessen wird execute() bis zur ersten Ergebniszeile; das Weiterlesen
+    eines lazy iterierten Cursors zählt nicht mit.
+    """
+
+    def execute(self, sql, parameters=()):
+        if not stats.ENABLED:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            stats.record_sql(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not stats.ENABLED:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            stats.record_sql(sql, time.perf_counter() - started)
+
+
+class _Connection(sqlite3.Connection):
+    """Verbindung, deren Cursor (auch für conn.execute) _TimedCursor sind."""
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if not stats.ENABLED:
+            return super().commit()
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            stats.record_sql("COMMIT", time.perf_counter() - started)
+
+
+def get_connection():
+    """
+    Liefert die Verbindung des aktuellen Threads und öffnet sie bei Bedarf.
+
+    Die Verbindung bleibt offen, damit nicht jeder Befehl erneut die Datei
+    öffnen und das Schema parsen muss. Wird DB_NAME geändert, wird neu verbunden.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.db_name == DB_NAME:
+        return conn
+    if conn is not None:
+        conn.close()
+
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+                           factory=_Connection)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -8000")  # ca. 8 MB Page-Cache
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+    _local.conn = conn
+    _local.db_name = DB_NAME
+    return conn
+
+
+def _reset_after_fork():
+    """
+    Im Kindprozess nach fork(): die geerbte Verbindung gehört dem Elternprozess.
+
+    Sie wird weder benutzt noch geschlossen (ein close() könnte den WAL des
+    Elternprozesses checkpointen); get_connection() öffnet eine eigene.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _inherited_connections.append(conn)
+    _local.conn = None
+    _local.in_batch = False
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def close_connection():
+    """Schließt die Verbindung des aktuellen Threads (falls vorhanden)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def _commit(conn):
+    """Schließt die Transaktion ab, außer im Batch-Modus (siehe batch())."""
+    if not getattr(_local, "in_batch", False):
+        conn.commit()
+
+
+@contextlib.contextmanager
+def batch():
+    """
+    Fasst alle Schreibzugriffe des aktuellen Threads zu einer Transaktion zusammen.
+
+    Die einzelnen Funktionen committen innerhalb des Blocks nicht selbst;
+    mit commit_batch() kann zwischendurch gruppiert committet werden.
+    Bei einer Ausnahme wird der offene Rest zurückgerollt.
+    """
+    conn = get_connection()
+    _local.in_batch = True
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        # Starts/Stops und neue Tasks im Speicher passen nicht mehr zur Datenbank
+        reset_running_state()
+        reset_task_names()
+        raise
+    finally:
+        _local.in_batch = False
+
+
+def commit_batch():
+    """Committet die bisher im Batch gesammelten Änderungen."""
+    get_connection().commit()
+
+
+def _is_busy(error):
+    return "locked" in str(error) or "busy" in str(error)
+
+def _write_transaction(conn, func):
+    """
+    Führt func(cursor) als eine Schreibtransaktion aus und liefert das Ergebnis.
+
+    BEGIN IMMEDIATE holt die Schreibsperre vor dem ersten Lesen, daher
+    kann zwischen Prüfen und Schreiben kein anderer Prozess oder Thread
+    dazwischenkommen, und es gibt kein 'database is locked' beim späteren
+    Hochstufen einer Lesetransaktion. Ist die Datenbank länger als
+    BUSY_TIMEOUT gesperrt, wird mit Backoff bis zu WRITE_RETRIES-mal
+    wiederholt. Im Batch-Modus wird nicht committet; ist dort bereits eine
+    Transaktion offen, läuft func darin (ohne Wiederholung).
+
+    Außerhalb eines Batches wird eine noch offene Transaktion (etwa nach
+    einem abgebrochenen Befehl) zurückgerollt. Sie würde sonst die
+    Schreibsperre halten und die Änderung nie committen.
+    """
+    if conn.in_transaction:
+        if getattr(_local, "in_batch", False):
+            return func(conn.cursor())
+        conn.rollback()
+
+    for attempt in range(WRITE_RETRIES):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = func(conn.cursor())
+            _commit(conn)
+            return result
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not _is_busy(e) or attempt == WRITE_RETRIES - 1:
+                raise
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        time.sleep(WRITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+# Schema-Migrationen, Index + 1 = Schema-Version (PRAGMA user_version).
+# Neue Migrationen werden nur angehängt, bestehende nie verändert.
+MIGRATIONS = [
+    # 1: Ursprüngliches Schema (übernimmt auch bestehende Datenbanken ohne Version)
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL UNIQUE,
         is_running INTEGER NOT NULL DEFAULT 0,
         current_start TIMESTAMP,
         minimum_minutes INTEGER NOT NULL DEFAULT 0
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS sessions (
+    );
+    CREATE TABLE IF NOT EXISTS sessions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         task_id INTEGER NOT NULL,
         start TIMESTAMP,
         end TIMESTAMP,
         duration_sec INTEGER,
         FOREIGN KEY(task_id) REFERENCES tasks(id)
-    )""")
-    conn.commit()
-    conn.close()
+    );
+    """,
+    # 2: sessions mit ON DELETE CASCADE neu aufbauen und indizieren
+    """
+    CREATE TABLE sessions_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL,
+        start TIMESTAMP,
+        end TIMESTAMP,
+        duration_sec INTEGER,
+        FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
+    );
+    INSERT INTO sessions_new (id, task_id, start, end, duration_sec)
+        SELECT id, task_id, start, end, duration_sec FROM sessions;
+    DROP TABLE sessions;
+    ALTER TABLE sessions_new RENAME TO sessions;
+    CREATE INDEX idx_sessions_task_start ON sessions(task_id, start);
+    CREATE INDEX idx_sessions_start ON sessions(start);
+    """,
+    # 3: Tagessummen je Task für zusammenfassende Berichte
+    """
+    CREATE TABLE session_rollup (
+        task_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        total_sec INTEGER NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (task_id, day),
+        FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_rollup_day ON session_rollup(day);
+    INSERT INTO session_rollup (task_id, day, total_sec, count)
+        SELECT task_id, date(start), SUM(duration_sec), COUNT(*)
+        FROM sessions GROUP BY task_id, date(start);
+    """,
+    # 4: Zeitstempel als ganzzahlige Epoch-Sekunden statt ISO-Text (lokale Zeit -> UTC)
+    """
+    UPDATE sessions SET
+        start = CAST(strftime('%s', start, 'utc') AS INTEGER),
+        end = CAST(strftime('%s', end, 'utc') AS INTEGER)
+    WHERE typeof(start) = 'text';
+    UPDATE tasks SET current_start = CAST(strftime('%s', current_start, 'utc') AS INTEGER)
+    WHERE typeof(current_start) = 'text';
+    """,
+    # 5: Verzeichnis der Jahresarchive (siehe archive_sessions)
+    """
+    CREATE TABLE archives (
+        year INTEGER PRIMARY KEY,
+        file TEXT NOT NULL,
+        first_start INTEGER NOT NULL,
+        last_start INTEGER NOT NULL,
+        count INTEGER NOT NULL
+    );
+    """,
+    # 6: Tagesindex der Tagessummen abdeckend machen (report group=day|week
+    # liest dann nur den Index statt je Zeile zusätzlich den Primärschlüssel)
+    """
+    DROP INDEX idx_rollup_day;
+    CREATE INDEX idx_rollup_day ON session_rollup(day, total_sec, count);
+    """,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Eine Session zählt zum (lokalen) Tag ihres Starts
+ROLLUP_DAY_SQL = "date(start, 'unixepoch', 'localtime')"
+
+ROLLUP_UPSERT = """
+    INSERT INTO session_rollup (task_id, day, total_sec, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT(task_id, day) DO UPDATE SET
+        total_sec = total_sec + excluded.total_sec,
+        count = count + excluded.count
+"""
+
+
+def _split_script(script):
+    """Zerlegt ein SQL-Skript in einzelne Statements (für execute statt executescript)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+def init_db():
+    """
+    Bringt das Schema auf den aktuellen Stand.
+
+    Ist die Datenbank bereits auf SCHEMA_VERSION, wird nur die Version gelesen.
+    Jede Migration läuft in einer eigenen BEGIN-IMMEDIATE-Transaktion; die
+    Version wird darin erneut gelesen. Startet ein zweiter Prozess während
+    einer Migration, wartet er (bis MIGRATION_BUSY_TIMEOUT) und überspringt
+    die Schritte, die der andere Prozess bereits ausgeführt hat.
+    """
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    if conn.in_transaction:
+        conn.rollback()
+    # Beim Umbau von Tabellen dürfen Fremdschlüssel nicht greifen
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute(f"PRAGMA busy_timeout = {int(MIGRATION_BUSY_TIMEOUT * 1000)}")
+    try:
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+                    conn.rollback()
+                    continue
+                for statement in _split_script(MIGRATIONS[number - 1]):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        conn.execute("PRAGMA foreign_keys = ON")
+
+def running_tasks():
+    """
+    Laufende Tasks als {Name: current_start} (Epoch-Sekunden).
+
+    Der Stand wird einmal aus der Datenbank geladen und danach von
+    start_task, stop_task und delete_task fortgeschrieben; weitere Aufrufe
+    lesen nur den Speicher (z. B. der Sekundentakt der GUI). Das Dict
+    darf nicht verändert werden. Änderungen anderer Prozesse werden erst
+    nach reset_running_state() sichtbar.
+    """
+    running = _running
+    if running is None or _running_db != DB_NAME:
+        running = _load_running()
+    return running
+
+def _load_running():
+    global _running, _running_db
+    # Unter dem Lock, damit kein gleichzeitiger Start/Stop verloren geht
+    with _running_lock:
+        rows = get_connection().execute("SELECT name, current_start FROM tasks WHERE is_running = 1")
+        _running = dict(rows)
+        _running_db = DB_NAME
+        return _running
+
+def _update_running(taskname, start=None):
+    """Trägt einen Start (start = Epoch-Sekunden) oder Stop (None) ein."""
+    if start is None:
+        _update_running_many(stopped=(taskname,))
+    else:
+        _update_running_many(started=(taskname,), start=start)
+
+def _update_running_many(started=(), stopped=(), start=None):
+    """Trägt mehrere Starts (alle mit derselben Startzeit) und Stops auf einmal ein."""
+    global _running
+    with _running_lock:
+        if _running is None or _running_db != DB_NAME:
+            return  # wird beim nächsten Lesen vollständig geladen
+        running = dict(_running)
+        for taskname in stopped:
+            running.pop(taskname, None)
+        running.update(dict.fromkeys(started, start))
+        _running = running
+
+def reset_running_state():
+    """Verwirft den Speicherstand; der nächste Zugriff lädt neu aus der Datenbank."""
+    global _running
+    with _running_lock:
+        _running = None
+
+# Höchstzahl Treffer bei der Vervollständigung
+COMPLETION_LIMIT = 50
+
+# Bis zu dieser Anzahl Tasks vergleichen Vorschläge mit allen Namen,
+# darüber nur mit Namen, die mit einem Teil des Eingegebenen beginnen.
+SUGGEST_FULL_SCAN = 2000
+SUGGEST_CANDIDATES = 500
+
+# Ab so vielen neuen Namen wird die Liste neu sortiert statt per insort ergänzt
+NAMES_BULK_SIZE = 1000
+
+def task_names():
+    """
+    Alle Tasknamen als sortierte Liste (nur lesen, nicht verändern).
+
+    Wird einmal aus der Datenbank geladen und danach von add_task,
+    delete_task und import_sessions fortgeschrieben. Änderungen anderer
+    Prozesse werden erst nach reset_task_names() sichtbar.
+    """
+    global _names, _names_db
+    names = _names
+    if names is None or _names_db != DB_NAME:
+        with _names_lock:
+            rows = get_connection().execute("SELECT name FROM tasks")
+            names = _names = sorted(row[0] for row in rows)
+            _names_db = DB_NAME
+    return names
+
+def _update_names(added=(), removed=()):
+    """Hält die sortierte Namensliste aktuell (bisect statt Neuladen)."""
+    global _names
+    with _names_lock:
+        if _names is None or _names_db != DB_NAME:
+            return  # wird beim nächsten Zugriff vollständig geladen
+        if len(added) > NAMES_BULK_SIZE:
+            # Viele neue Namen (Import): einmal sortieren statt einzeln einfügen
+            _names = sorted(set(_names).union(added))
+            added = ()
+        for name in added:
+            index = bisect_left(_names, name)
+            if index == len(_names) or _names[index] != name:
+                insort(_names, name)
+        if len(removed) > NAMES_BULK_SIZE:
+            removed = set(removed)
+            _names = [name for name in _names if name not in removed]
+            removed = ()
+        for name in removed:
+            index = bisect_left(_names, name)
+            if index < len(_names) and _names[index] == name:
+                del _names[index]
+
+def reset_task_names():
+    """Verwirft die Namensliste; der nächste Zugriff lädt neu aus der Datenbank."""
+    global _names
+    with _names_lock:
+        _names = None
+
+def complete_task_names(prefix, limit=COMPLETION_LIMIT):
+    """Tasknamen, die mit prefix beginnen (sortiert, höchstens limit), per Binärsuche."""
+    names = task_names()
+    index = bisect_left(names, prefix)
+    matches = []
+    while index < len(names) and len(matches) < limit and names[index].startswith(prefix):
+        matches.append(names[index])
+        index += 1
+    return matches
+
+def suggest_task_names(taskname, limit=3):
+    """
+    Ähnliche Tasknamen für 'Meintest du ...?' (difflib).
+
+    Bei vielen Tasks werden nur Namen verglichen, die mit einem möglichst
+    langen Anfangsstück von taskname beginnen; ein Tippfehler im ersten
+    Zeichen findet dann keinen Vorschlag.
+    """
+    import difflib
+
+    names = task_names()
+    if len(names) <= SUGGEST_FULL_SCAN:
+        candidates = names
+    else:
+        candidates = []
+        for length in range(len(taskname) - 1, 0, -1):
+            candidates = complete_task_names(taskname[:length], limit=SUGGEST_CANDIDATES)
+            if len(candidates) >= limit:
+                break
+    return difflib.get_close_matches(taskname, candidates, n=limit)
+
+def _task_not_found(taskname, output_func):
+    """Meldung für unbekannte Tasks, mit Vorschlägen ähnlicher Namen."""
+    suggestions = suggest_task_names(taskname)
+    if suggestions:
+        output_func(f"Task '{taskname}' existiert nicht. Meintest du: {', '.join(suggestions)}?")
+    else:
+        output_func(f"Task '{taskname}' existiert nicht.")
 
 def add_task(taskname, minimum_str=None, output_func=print):
     min_minutes = 0
@@ -40,120 +533,597 @@ def add_task(taskname, minimum_str=None, output_func=print):
         except ValueError:
             pass
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute("SELECT id FROM tasks WHERE name = ?", (taskname,))
     if cur.fetchone():
         output_func(f"Task '{taskname}' existiert bereits.")
-        conn.close()
         return
 
     cur.execute(
         "INSERT INTO tasks (name, is_running, current_start, minimum_minutes) VALUES (?, 0, NULL, ?)",
         (taskname, min_minutes)
     )
-    conn.commit()
-    conn.close()
+    _commit(conn)
+    _update_names(added=(taskname,))
     output_func(f"Task '{taskname}' wurde angelegt (Mindest-Minuten: {min_minutes}).")
 
+def _task_state(cur, taskname):
+    """(is_running, current_start) des Tasks oder None, wenn es ihn nicht gibt."""
+    return cur.execute("SELECT is_running, current_start FROM tasks WHERE name = ?", (taskname,)).fetchone()
+
+def _sync_running(taskname, state):
+    """
+    Gleicht den Speicherstand mit dem Datenbankstand ab, wenn ein Start oder
+    Stop nicht stattfand (z. B. weil ein anderer Prozess schneller war).
+    """
+    if state is None:
+        _update_running(taskname)
+        _update_names(removed=(taskname,))
+    elif state[0]:
+        _update_running(taskname, state[1])
+    else:
+        _update_running(taskname)
+
 def start_task(taskname, output_func=print):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, is_running FROM tasks WHERE name = ?", (taskname,))
-    task_row = cur.fetchone()
-    if not task_row:
-        output_func(f"Task '{taskname}' existiert nicht.")
-        conn.close()
-        return
+    """Startet den Task; liefert True, wenn er gestartet wurde."""
+    def transition(cur):
+        # Zeit erst unter der Schreibsperre nehmen, sonst könnte der Start
+        # vor dem Ende eines gerade von anderer Seite gestoppten Laufs liegen.
+        # Bedingtes UPDATE: von gleichzeitigen Starts gewinnt genau einer.
+        now = int(time.time())
+        cur.execute("UPDATE tasks SET is_running = 1, current_start = ? WHERE name = ? AND is_running = 0",
+                    (now, taskname))
+        if cur.rowcount:
+            return True, now
+        return False, _task_state(cur, taskname)
 
-    task_id, is_running = task_row
-    if is_running:
-        output_func(f"Task '{taskname}' läuft bereits.")
-        conn.close()
-        return
+    started, value = _write_transaction(get_connection(), transition)
+    if not started:
+        _sync_running(taskname, value)
+        if value is None:
+            _task_not_found(taskname, output_func)
+        else:
+            output_func(f"Task '{taskname}' läuft bereits.")
+        return False
 
-    now = datetime.datetime.now()
-    cur.execute("UPDATE tasks SET is_running = 1, current_start = ? WHERE id = ?", (now, task_id))
-    conn.commit()
-    conn.close()
+    _update_running(taskname, value)
     output_func(f"Task '{taskname}' wurde gestartet.")
+    return True
 
-def stop_task(taskname, output_func=print):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, is_running, current_start, minimum_minutes FROM tasks WHERE name = ?", (taskname,))
-    task_row = cur.fetchone()
-    if not task_row:
-        output_func(f"Task '{taskname}' existiert nicht.")
-        conn.close()
-        return
+# Legt Sessions nur für laufende Tasks an; Mindest-Minuten werden berücksichtigt
+STOP_INSERT = """
+    INSERT INTO sessions (task_id, start, end, duration_sec)
+    SELECT id, current_start, :now, max(:now - current_start, minimum_minutes * 60)
+    FROM tasks WHERE {condition} AND is_running = 1
+"""
 
-    task_id, is_running, current_start, min_minutes = task_row
-    if not is_running:
-        output_func(f"Task '{taskname}' ist nicht aktiv.")
-        conn.close()
-        return
+def _stop_running(cur, condition, name):
+    """
+    Stoppt alle laufenden Tasks, auf die condition ('name = :name' oder
+    'name GLOB :name') zutrifft, mit einem Statement je Schritt: Sessions per
+    INSERT ... SELECT, Tagessummen, Zurücksetzen der Tasks.
+    Liefert [(name, start, dauer)]; muss in _write_transaction laufen.
+    """
+    # Zeit erst unter der Schreibsperre nehmen, sonst könnte eine Session
+    # vor dem Ende eines gerade von anderer Seite gestoppten Laufs beginnen
+    params = {"now": int(time.time()), "name": name}
+    insert = STOP_INSERT.format(condition=condition)
+    if HAS_RETURNING:
+        sessions = cur.execute(insert + " RETURNING task_id, start, duration_sec", params).fetchall()
+    else:
+        last_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM sessions").fetchone()[0]
+        cur.execute(insert, params)
+        sessions = cur.execute("SELECT task_id, start, duration_sec FROM sessions WHERE id > ?",
+                               (last_id,)).fetchall()
+    if not sessions:
+        return []
 
-    now = datetime.datetime.now()
-    start_time = datetime.datetime.fromisoformat(current_start)
-    duration = (now - start_time).total_seconds()
+    # Je Task genau eine neue Session, also auch genau eine Zeile je (Task, Tag)
+    cur.executemany(ROLLUP_UPSERT, [(task_id, local_day(start), duration, 1)
+                                    for task_id, start, duration in sessions])
+    names = dict(cur.execute(f"SELECT id, name FROM tasks WHERE {condition} AND is_running = 1", params))
+    cur.execute(f"UPDATE tasks SET is_running = 0, current_start = NULL WHERE {condition} AND is_running = 1",
+                params)
+    return [(names[task_id], start, duration) for task_id, start, duration in sessions]
 
-    # Mindest-Minuten berücksichtigen
-    duration = max(duration, min_minutes * 60)
+def stop_task(taskname, output_func=print):
+    """Stoppt den Task und speichert die Session; liefert True, wenn er gestoppt wurde."""
+    def transition(cur):
+        stopped = _stop_running(cur, "name = :name", taskname)
+        if stopped:
+            return True, stopped[0][2]
+        return False, _task_state(cur, taskname)
 
-    cur.execute(
-        "INSERT INTO sessions (task_id, start, end, duration_sec) VALUES (?, ?, ?, ?)",
-        (task_id, current_start, now, int(duration))
-    )
-    cur.execute("UPDATE tasks SET is_running = 0, current_start = NULL WHERE id = ?", (task_id,))
-    conn.commit()
-    conn.close()
-    output_func(f"Task '{taskname}' wurde gestoppt. Dauer: {duration / 60:.2f} Minuten.")
+    stopped, value = _write_transaction(get_connection(), transition)
+    if not stopped:
+        _sync_running(taskname, value)
+        if value is None:
+            _task_not_found(taskname, output_func)
+        else:
+            output_func(f"Task '{taskname}' ist nicht aktiv.")
+        return False
+
+    _update_running(taskname)
+    output_func(f"Task '{taskname}' wurde gestoppt. Dauer: {value / 60:.2f} Minuten.")
+    return True
 
 def delete_task(taskname, output_func=print, is_gui=False):
     """
     Löscht den Task direkt, ohne MessageBox.
     Die Sicherheitsabfrage übernehmen wir in der GUI (pending_delete).
     """
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute("SELECT id FROM tasks WHERE name = ?", (taskname,))
     task_row = cur.fetchone()
     if not task_row:
-        output_func(f"Task '{taskname}' existiert nicht.")
-        conn.close()
+        _task_not_found(taskname, output_func)
         return
 
     # Hier KEINE Interaktion mit tkinter.messagebox oder input().
     # Wir verlassen uns darauf, dass GUI/CLI bereits "y" abgefragt hat.
+    # Die Sessions werden per ON DELETE CASCADE mitgelöscht; archivierte
+    # Sessions bleiben im Archiv, fallen aber über den JOIN auf tasks heraus.
     task_id = task_row[0]
-    cur.execute("DELETE FROM sessions WHERE task_id = ?", (task_id,))
     cur.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-    conn.commit()
-    conn.close()
+    _commit(conn)
+    _update_running(taskname)
+    _update_names(removed=(taskname,))
     output_func(f"Task '{taskname}' wurde gelöscht.")
 
-def list_tasks(output_func=print):
-    conn = sqlite3.connect(DB_NAME)
+# Zeichen, an denen ein Taskname als Glob-Muster erkannt wird (SQLite GLOB)
+TASK_PATTERN_CHARS = "*?["
+
+# So viele Namen führen Sammelmeldungen höchstens auf
+BULK_NAMES_SHOWN = 10
+
+def is_task_pattern(name):
+    """
+    True, wenn name als Glob-Muster wie 'tmp-*' wirkt (Groß-/Kleinschreibung zählt).
+
+    Heißt ein Task genau so (z. B. 'a[1]'), ist dieser Task gemeint und nicht das Muster.
+    """
+    return any(char in name for char in TASK_PATTERN_CHARS) and not task_exists(name)
+
+def match_tasks(pattern):
+    """Namen aller Tasks, auf die das Glob-Muster passt, sortiert."""
+    cur = get_connection().execute("SELECT name FROM tasks WHERE name GLOB ? ORDER BY name", (pattern,))
+    return [row[0] for row in cur]
+
+def format_task_list(names):
+    """'a, b, c und 7 weitere' für Sammelmeldungen und Rückfragen."""
+    shown = ", ".join(names[:BULK_NAMES_SHOWN])
+    more = f" und {len(names) - BULK_NAMES_SHOWN} weitere" if len(names) > BULK_NAMES_SHOWN else ""
+    return shown + more
+
+def _bulk_message(names, action):
+    return f"{len(names)} Task(s) wurden {action}: {format_task_list(names)}"
+
+def start_tasks(pattern, output_func=print):
+    """
+    Startet alle gestoppten Tasks, die zum Glob-Muster passen, mit einem
+    UPDATE in einer Transaktion. Liefert die Anzahl gestarteter Tasks.
+    """
+    def transition(cur):
+        now = int(time.time())
+        update = "UPDATE tasks SET is_running = 1, current_start = :now WHERE name GLOB :name AND is_running = 0"
+        params = {"now": now, "name": pattern}
+        if HAS_RETURNING:
+            names = [row[0] for row in cur.execute(update + " RETURNING name", params)]
+        else:
+            names = [row[0] for row in cur.execute(
+                "SELECT name FROM tasks WHERE name GLOB :name AND is_running = 0", params)]
+            cur.execute(update, params)
+        return now, sorted(names)
+
+    now, names = _write_transaction(get_connection(), transition)
+    if not names:
+        output_func(f"Kein gestoppter Task passt zu '{pattern}'.")
+        return 0
+    _update_running_many(started=names, start=now)
+    output_func(_bulk_message(names, "gestartet"))
+    return len(names)
+
+def stop_tasks(pattern="*", output_func=print):
+    """
+    Stoppt alle laufenden Tasks, die zum Glob-Muster passen ('*' = alle),
+    und legt ihre Sessions samt Tagessummen in einer Transaktion an.
+    Liefert die Anzahl gestoppter Tasks.
+    """
+    stopped = _write_transaction(get_connection(),
+                                 lambda cur: _stop_running(cur, "name GLOB :name", pattern))
+    if not stopped:
+        output_func(f"Kein laufender Task passt zu '{pattern}'.")
+        return 0
+    names = sorted(name for name, _, _ in stopped)
+    _update_running_many(stopped=names)
+    total = sum(duration for _, _, duration in stopped)
+    output_func(f"{_bulk_message(names, 'gestoppt')}. Dauer gesamt: {total / 60:.2f} Minuten.")
+    return len(names)
+
+def delete_tasks(pattern, output_func=print):
+    """
+    Löscht alle Tasks, die zum Glob-Muster passen, mit einem DELETE
+    (Sessions und Tagessummen per ON DELETE CASCADE). Liefert die Anzahl.
+    """
+    def transition(cur):
+        if HAS_RETURNING:
+            return [row[0] for row in cur.execute("DELETE FROM tasks WHERE name GLOB ? RETURNING name", (pattern,))]
+        names = [row[0] for row in cur.execute("SELECT name FROM tasks WHERE name GLOB ?", (pattern,))]
+        cur.execute("DELETE FROM tasks WHERE name GLOB ?", (pattern,))
+        return names
+
+    names = sorted(_write_transaction(get_connection(), transition))
+    if not names:
+        output_func(f"Kein Task passt zu '{pattern}'.")
+        return 0
+    _update_running_many(stopped=names)
+    _update_names(removed=names)
+    output_func(_bulk_message(names, "gelöscht"))
+    return len(names)
+
+# Anzahl Sessions pro Transaktion beim Import
+IMPORT_CHUNK_SIZE = 10000
+
+def _read_import_rows(path):
+    """
+    Liest Import-Zeilen als Dicts, CSV (mit Kopfzeile) oder NDJSON je nach Endung.
+
+    Ungültige JSON-Zeilen werden als None geliefert (zählen als übersprungen);
+    eine kaputte CSV-Datei wirft ValueError, eine nicht UTF-8-kodierte
+    UnicodeDecodeError.
+    """
+    import csv
+    import json
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".ndjson", ".jsonl")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None
+        else:
+            try:
+                yield from csv.DictReader(f)
+            except csv.Error as e:
+                raise ValueError(f"Ungültige CSV-Datei: {e}") from None
+
+def import_sessions(path, output_func=print):
+    """
+    Importiert historische Sessions aus CSV oder NDJSON.
+
+    Erwartete Felder: task, start, und end und/oder duration_sec
+    (Zeitstempel im ISO-Format). Fehlende Tasks werden angelegt.
+    Die Sessions werden in Blöcken von IMPORT_CHUNK_SIZE per executemany
+    eingefügt, jeder Block in einer eigenen Transaktion. Zeilen ohne Task,
+    mit ungültigen Zeitstempeln oder negativer Dauer werden übersprungen.
+    Bricht der Import ab (z. B. Datei nicht UTF-8), wird der offene Block
+    zurückgerollt; bereits committete Blöcke bleiben erhalten. Im Batch-Modus
+    wird nicht blockweise committet: der Import läuft in einem SAVEPOINT und
+    wird bei einem Abbruch vollständig zurückgerollt, der Rest des Batches
+    bleibt erhalten.
+    """
+    conn = get_connection()
+    in_batch = getattr(_local, "in_batch", False)
+    if in_batch:
+        # Ein äußerster SAVEPOINT würde bei RELEASE committen
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT import_sessions")
     cur = conn.cursor()
-    cur.execute("SELECT name, is_running, minimum_minutes FROM tasks")
-    tasks = cur.fetchall()
-    conn.close()
+    task_ids = dict(cur.execute("SELECT name, id FROM tasks"))
+
+    imported = 0
+    created = 0
+    skipped = 0
+    started = time.perf_counter()
 
-    if not tasks:
-        output_func("Keine Tasks vorhanden.")
+    def flush(sessions, rollup):
+        cur.executemany(
+            "INSERT INTO sessions (task_id, start, end, duration_sec) VALUES (?, ?, ?, ?)",
+            sessions
+        )
+        cur.executemany(ROLLUP_UPSERT, [(*key, sec, cnt) for key, (sec, cnt) in rollup.items()])
+        _commit(conn)
+        # Neue Tasks sind mit diesem Block committet
+        _update_names(added=new_names)
+        new_names.clear()
+
+    sessions = []
+    rollup = {}
+    new_names = []
+    try:
+        for row in _read_import_rows(path):
+            try:
+                name = row["task"]
+                # Zeitstempel ohne Zeitzone gelten als lokale Zeit
+                start = int(datetime.datetime.fromisoformat(row["start"]).timestamp())
+                if row.get("end"):
+                    end = int(datetime.datetime.fromisoformat(row["end"]).timestamp())
+                    duration = int(row.get("duration_sec") or end - start)
+                else:
+                    duration = int(row["duration_sec"])
+                    end = start + duration
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            if not isinstance(name, str) or not name.strip() or end < start or duration < 0:
+                skipped += 1
+                continue
+
+            task_id = task_ids.get(name)
+            if task_id is None:
+                cur.execute(
+                    "INSERT INTO tasks (name, is_running, current_start, minimum_minutes) VALUES (?, 0, NULL, 0)",
+                    (name,)
+                )
+                task_id = task_ids[name] = cur.lastrowid
+                new_names.append(name)
+                created += 1
+
+            sessions.append((task_id, start, end, duration))
+            totals = rollup.setdefault((task_id, local_day(start)), [0, 0])
+            totals[0] += duration
+            totals[1] += 1
+
+            if len(sessions) >= IMPORT_CHUNK_SIZE:
+                flush(sessions, rollup)
+                imported += len(sessions)
+                sessions = []
+                rollup = {}
+
+        if sessions:
+            flush(sessions, rollup)
+            imported += len(sessions)
+        elif created:
+            _commit(conn)
+            _update_names(added=new_names)
+        if in_batch:
+            conn.execute("RELEASE import_sessions")
+    except BaseException:
+        # Offenen Block bzw. im Batch-Modus den ganzen Import verwerfen
+        if in_batch and conn.in_transaction:
+            conn.execute("ROLLBACK TO import_sessions")
+            conn.execute("RELEASE import_sessions")
+        elif conn.in_transaction:
+            conn.rollback()
+        reset_running_state()
+        reset_task_names()
+        raise
+
+    elapsed = time.perf_counter() - started
+    rate = imported / elapsed if elapsed > 0 else 0.0
+    output_func(
+        f"Import abgeschlossen: {imported} Sessions, {created} neue Tasks, "
+        f"{skipped} Zeilen übersprungen ({rate:.0f} Sessions/s)."
+    )
+
+def format_timestamp(ts):
+    """Epoch-Sekunden als lokale Zeit 'YYYY-MM-DD HH:MM:SS' (None bleibt leer)."""
+    if ts is None:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+def format_elapsed(seconds):
+    """Dauer in Sekunden als H:MM:SS."""
+    seconds = max(int(seconds), 0)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def local_day(ts):
+    """Lokales Datum (YYYY-MM-DD) zu Epoch-Sekunden, wie in session_rollup.day."""
+    return datetime.date.fromtimestamp(ts).isoformat()
+
+class Task:
+    """Ein Task-Datensatz (kompakt dank __slots__)."""
+    __slots__ = ("id", "name", "is_running", "current_start", "minimum_minutes")
+
+    def __init__(self, id, name, is_running, current_start, minimum_minutes):
+        self.id = id
+        self.name = name
+        self.is_running = bool(is_running)
+        self.current_start = current_start
+        self.minimum_minutes = minimum_minutes
+
+    def __repr__(self):
+        return f"Task(name={self.name!r}, is_running={self.is_running}, minimum_minutes={self.minimum_minutes})"
+
+class Session:
+    """Eine abgeschlossene Session inklusive Task-Name (kompakt dank __slots__)."""
+    __slots__ = ("task_name", "start", "end", "duration_sec", "id")
+
+    def __init__(self, task_name, start, end, duration_sec, id):
+        self.task_name = task_name
+        self.start = start
+        self.end = end
+        self.duration_sec = duration_sec
+        self.id = id
+
+    def __repr__(self):
+        return f"Session(task_name={self.task_name!r}, start={self.start!r}, duration_sec={self.duration_sec})"
+
+TASK_COLUMNS = "id, name, is_running, current_start, minimum_minutes"
+
+def iter_tasks():
+    """Liefert alle Tasks als Task-Objekte (in Anlagereihenfolge)."""
+    cur = get_connection().cursor()
+    cur.execute(f"SELECT {TASK_COLUMNS} FROM tasks")
+    for row in cur:
+        yield Task(*row)
+
+def get_task(taskname):
+    """Liefert den Task mit diesem Namen oder None."""
+    cur = get_connection().cursor()
+    cur.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE name = ?", (taskname,))
+    row = cur.fetchone()
+    return Task(*row) if row else None
+
+def task_exists(taskname):
+    """True, wenn es einen Task mit genau diesem Namen gibt."""
+    cur = get_connection().execute("SELECT 1 FROM tasks WHERE name = ?", (taskname,))
+    return cur.fetchone() is not None
+
+# Archivierte Sessions liegen in einer Datei pro Jahr neben der Datenbank
+# (tasks.db -> tasks_archive_2023.db) und werden unter diesem Alias angehängt.
+ARCHIVE_FILE = "{stem}_archive_{year}.db"
+ARCHIVE_ALIAS = "archive_{year}"
+
+# SQLITE_MAX_ATTACHED, wenn sich das Limit nicht abfragen lässt (Python < 3.11)
+ATTACHED_LIMIT = 10
+
+# Eine Session gehört zum Archiv des (lokalen) Jahres ihres Starts
+ARCHIVE_YEAR_SQL = "CAST(strftime('%Y', start, 'unixepoch', 'localtime') AS INTEGER)"
+
+ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS {alias}.sessions (
+        id INTEGER PRIMARY KEY,
+        task_id INTEGER NOT NULL,
+        start TIMESTAMP,
+        end TIMESTAMP,
+        duration_sec INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {alias}.idx_sessions_task_start ON sessions(task_id, start)",
+    "CREATE INDEX IF NOT EXISTS {alias}.idx_sessions_start ON sessions(start)",
+)
+
+class ArchiveMissingError(FileNotFoundError):
+    """Die Archivdatei eines angefragten Jahres fehlt (Pfad in 'filename')."""
+
+
+def _archive_path(file_name):
+    """Archivdateien werden relativ zum Verzeichnis der Datenbank aufgelöst."""
+    return os.path.join(os.path.dirname(os.path.abspath(DB_NAME)), file_name)
+
+def _year_start(year):
+    """Epoch-Sekunden des 1. Januar 00:00 (lokale Zeit)."""
+    return int(datetime.datetime(year, 1, 1).timestamp())
+
+def _attach_archives(conn, years, create=False):
+    """
+    Hängt die Archive der angegebenen Jahre an und liefert ihre Aliasse.
+
+    Bereits angehängte Archive bleiben angehängt, damit Folgeabfragen kein
+    ATTACH mehr brauchen; nicht benötigte werden erst abgehängt, wenn sonst
+    das SQLite-Limit für angehängte Datenbanken überschritten würde.
+    Ohne 'create' muss die Archivdatei existieren (sonst ArchiveMissingError).
+    """
+    wanted = {ARCHIVE_ALIAS.format(year=year): year for year in years}
+    if not wanted:
+        return []
+    # Connection.getlimit gibt es erst ab Python 3.11, sonst gilt SQLites Standardlimit
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, "getlimit") else ATTACHED_LIMIT
+    if len(wanted) > limit:
+        raise ValueError(f"Zeitraum umfasst {len(wanted)} Archive, höchstens {limit} sind möglich.")
+
+    attached = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("archive_")]
+    missing = [alias for alias in wanted if alias not in attached]
+    if not missing:
+        return list(wanted)
+
+    # ATTACH/DETACH sind in einer offenen Transaktion nicht erlaubt (Batch-Modus)
+    if conn.in_transaction:
+        conn.commit()
+
+    unused = [alias for alias in attached if alias not in wanted]
+    for alias in unused[:max(0, len(attached) + len(missing) - limit)]:
+        conn.execute(f"DETACH DATABASE {alias}")
+
+    stem = os.path.splitext(os.path.basename(DB_NAME))[0]
+    for alias in missing:
+        path = _archive_path(ARCHIVE_FILE.format(stem=stem, year=wanted[alias]))
+        if not create and not os.path.exists(path):
+            raise ArchiveMissingError(errno.ENOENT, "Archivdatei fehlt", path)
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+        if create:
+            for statement in ARCHIVE_SCHEMA:
+                conn.execute(statement.format(alias=alias))
+    return list(wanted)
+
+def _archive_years(conn, start_date=None, end_date=None):
+    """Jahre der Archive, die Sessions im Zeitraum [start_date, end_date) enthalten können."""
+    cur = conn.execute(
+        """
+        SELECT year FROM archives
+        WHERE (?1 IS NULL OR last_start >= ?1) AND (?2 IS NULL OR first_start < ?2)
+        ORDER BY year
+        """,
+        (start_date, end_date)
+    )
+    return [row[0] for row in cur]
+
+def archive_sessions(before, output_func=print):
+    """
+    Verschiebt alle Sessions, die vor 'before' (Epoch-Sekunden) beginnen,
+    in die Jahresarchive und hält das Verzeichnis 'archives' aktuell.
+
+    Jedes Jahr wird in einer eigenen Transaktion verschoben und committet
+    (auch im Batch-Modus). Die Tagessummen bleiben unverändert in der
+    Hauptdatenbank. Sessions, die nach einem Abbruch doppelt vorliegen,
+    werden beim nächsten Lauf per INSERT OR IGNORE bereinigt.
+    """
+    conn = get_connection()
+    years = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT {ARCHIVE_YEAR_SQL} FROM sessions WHERE start < ?", (before,)
+    )]
+    if not years:
+        output_func("Keine Sitzungen zum Archivieren gefunden.")
         return
 
-    for name, is_running, min_minutes in tasks:
-        status = "läuft" if is_running else "inaktiv"
-        output_func(f"Task: {name}, Status: {status}, Mindest-Minuten: {min_minutes}")
+    stem = os.path.splitext(os.path.basename(DB_NAME))[0]
+    moved = 0
+    for year in sorted(years):
+        alias = _attach_archives(conn, [year], create=True)[0]
+        bounds = (_year_start(year), min(_year_start(year + 1), before))
+        cur = conn.cursor()
+        cur.execute(f"""
+            INSERT OR IGNORE INTO {alias}.sessions (id, task_id, start, end, duration_sec)
+            SELECT id, task_id, start, end, duration_sec FROM main.sessions
+            WHERE start >= ? AND start < ?
+        """, bounds)
+        cur.execute("DELETE FROM main.sessions WHERE start >= ? AND start < ?", bounds)
+        count = cur.rowcount
+        cur.execute(f"""
+            INSERT INTO archives (year, file, first_start, last_start, count)
+            SELECT ?, ?, MIN(start), MAX(start), COUNT(*) FROM {alias}.sessions WHERE true
+            ON CONFLICT(year) DO UPDATE SET
+                first_start = excluded.first_start,
+                last_start = excluded.last_start,
+                count = excluded.count
+        """, (year, ARCHIVE_FILE.format(stem=stem, year=year)))
+        conn.commit()
+        moved += count
+        output_func(f"Archiv {year}: {count} Sitzungen verschoben.")
+
+    output_func(f"Archivierung abgeschlossen: {moved} Sitzungen.")
+
+SESSION_COLUMNS = "t.name, s.start, s.end, s.duration_sec, s.id"
 
-def report_tasks_filtered(start_date=None, end_date=None, task_name=None, output_func=print):
+def _session_query(start_date=None, end_date=None, task_name=None, after=None, limit=None,
+                   archives=(), columns=SESSION_COLUMNS, start_before=None):
     """
-    Generiert einen Bericht basierend auf optionalem Zeitraum und Task.
+    Baut die gefilterte Session-Abfrage für Bericht und Export.
+
+    start_date/end_date sind Epoch-Sekunden: Sessions, die ab start_date
+    beginnen und vor end_date enden. Sortiert wird stabil nach (s.start, s.id),
+    damit 'after' (die ID der zuletzt gezeigten Session) als Keyset-Position
+    für die nächste Seite dient. 'archives' sind die Aliasse angehängter
+    Jahresarchive, die per UNION ALL mit abgefragt werden; 'columns' ist die
+    Spaltenliste (Standard: passend zu Session). 'start_before' begrenzt nur
+    den Beginn (für überschneidungsfreie Monatsteile bei export-all).
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+    if archives:
+        # Die Filter werden von SQLite in jeden Teil der UNION geschoben
+        sessions = "(" + " UNION ALL ".join(
+            f"SELECT id, task_id, start, end, duration_sec FROM {name}.sessions"
+            for name in ("main", *archives)
+        ) + ")"
+    else:
+        sessions = "sessions"
 
     task_filter = ""
     params = []
@@ -162,94 +1132,556 @@ def report_tasks_filtered(start_date=None, end_date=None, task_name=None, output
         task_filter += " AND t.name = ?"
         params.append(task_name)
 
-    if start_date:
+    if start_date is not None:
         task_filter += " AND s.start >= ?"
         params.append(start_date)
 
-    if end_date:
-        task_filter += " AND s.end <= ?"
-        params.append(end_date)
+    if end_date is not None:
+        # Wegen start <= end begrenzt die zweite Bedingung den Index-Bereich auf s.start
+        task_filter += " AND s.end < ? AND s.start < ?"
+        params.extend((end_date, end_date))
+
+    if start_before is not None:
+        task_filter += " AND s.start < ?"
+        params.append(start_before)
+
+    if after is not None:
+        task_filter += f" AND (s.start, s.id) > (SELECT start, id FROM {sessions} WHERE id = ?)"
+        params.append(after)
 
     query = f"""
-        SELECT t.name, s.start, s.end, s.duration_sec
+        SELECT {columns}
         FROM tasks t
-        JOIN sessions s ON t.id = s.task_id
+        JOIN {sessions} s ON t.id = s.task_id
         WHERE 1=1 {task_filter}
-        ORDER BY s.start ASC
+        ORDER BY s.start ASC, s.id ASC
+    """
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return query, params
+
+def _session_cursor(start_date=None, end_date=None, task_name=None, after=None, limit=None,
+                    columns=SESSION_COLUMNS, start_before=None):
     """
+    Führt die gefilterte Session-Abfrage aus und liefert den Cursor.
 
+    Nur die Jahresarchive, die den Zeitraum überschneiden, werden angehängt.
+    """
+    conn = get_connection()
+    until = min((d for d in (end_date, start_before) if d is not None), default=None)
+    archives = _attach_archives(conn, _archive_years(conn, start_date, until))
+    cur = conn.cursor()
+    query, params = _session_query(start_date, end_date, task_name, after, limit, archives, columns,
+                                   start_before)
     cur.execute(query, params)
-    sessions = cur.fetchall()
-    conn.close()
+    return cur
 
-    if not sessions:
+def session_rows(columns, start_date=None, end_date=None, task_name=None, start_before=None):
+    """Cursor über die gefilterten Sessions (inklusive Archive) mit eigener Spaltenliste, z. B. für analytics."""
+    return _session_cursor(start_date, end_date, task_name, columns=columns, start_before=start_before)
+
+def iter_sessions(start_date=None, end_date=None, task_name=None, after=None, limit=None, start_before=None):
+    """
+    Liefert die gefilterten Sessions als Session-Objekte, direkt aus dem Cursor.
+    """
+    for row in _session_cursor(start_date, end_date, task_name, after, limit, start_before=start_before):
+        yield Session(*row)
+
+# Berichts-Cache: so viele Filterkombinationen je Verbindung (LRU), und nur
+# Ergebnisse bis zu dieser Größe; größere werden wie bisher nur gestreamt
+REPORT_CACHE_SIZE = 8
+REPORT_CACHE_MAX_ROWS = 20000
+
+def _data_token(conn):
+    """
+    Stand der Daten aus Sicht der Verbindung: PRAGMA data_version ändert sich
+    bei Commits anderer Verbindungen (auch anderer Prozesse), total_changes
+    bei jeder eigenen Änderung.
+    """
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+def _report_cache_lookup(conn, key):
+    """
+    Liefert (cache, token, gecachte Sessions oder None) und zählt Treffer/Fehlschläge.
+
+    In einer offenen Schreibtransaktion (Batch) wird nichts gecacht, da die
+    Änderungen noch zurückgerollt werden könnten; cache ist dann None.
+    """
+    if conn.in_transaction:
+        return None, None, None
+    cache = getattr(conn, "report_cache", None)
+    if cache is None:
+        cache = conn.report_cache = OrderedDict()
+    token = _data_token(conn)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == token:
+        cache.move_to_end(key)
+        stats.count("report_cache_hit")
+        return cache, token, entry[1]
+    stats.count("report_cache_miss")
+    return cache, token, None
+
+def cached_sessions(start_date=None, end_date=None, task_name=None):
+    """
+    Wie iter_sessions(), aber über einen LRU-Cache der Verbindung.
+
+    Derselbe Filter (etwa erst report, dann export) wird nur einmal
+    abgefragt, solange sich die Daten nicht geändert haben. Gespeichert
+    wird erst, wenn das Ergebnis vollständig gelesen wurde.
+    """
+    conn = get_connection()
+    key = (start_date, end_date, task_name)
+    cache, token, rows = _report_cache_lookup(conn, key)
+    if rows is not None:
+        yield from rows
+        return
+
+    rows = [] if cache is not None else None
+    for session in iter_sessions(start_date, end_date, task_name):
+        if rows is not None:
+            if len(rows) < REPORT_CACHE_MAX_ROWS:
+                rows.append(session)
+            else:
+                rows = None
+        yield session
+
+    if rows is not None:
+        cache[key] = (token, rows)
+        cache.move_to_end(key)
+        while len(cache) > REPORT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def clear_report_cache():
+    """Leert den Berichts-Cache der Verbindung des aktuellen Threads."""
+    cache = getattr(get_connection(), "report_cache", None)
+    if cache is not None:
+        cache.clear()
+
+def _cached_page(start_date, end_date, task_name, after, limit):
+    """
+    Seite aus einem gecachten Gesamtergebnis (gleiche Keyset-Reihenfolge wie
+    die Abfrage) oder None, wenn es keinen gültigen Eintrag gibt. Seiten
+    selbst füllen den Cache nicht, sie lesen weiter nur limit+1 Zeilen.
+    """
+    cache, token, rows = _report_cache_lookup(get_connection(), (start_date, end_date, task_name))
+    if rows is None:
+        return None
+    index = 0
+    if after is not None:
+        index = next((i + 1 for i, session in enumerate(rows) if session.id == after), None)
+        if index is None:
+            return None  # after liegt außerhalb des Filters: normal abfragen
+    return iter(rows[index:index + limit + 1])
+
+def report_tasks_filtered(start_date=None, end_date=None, task_name=None, output_func=print,
+                          limit=None, after=None):
+    """
+    Generiert einen Bericht basierend auf optionalem Zeitraum und Task.
+
+    Die Zeilen werden direkt aus dem Cursor ausgegeben, ohne die Ergebnismenge
+    zu materialisieren (bis REPORT_CACHE_MAX_ROWS landen sie im Berichts-Cache).
+    Mit 'limit' wird nur eine Seite ausgegeben; der Rückgabewert ist dann die
+    Session-ID für 'after=' der nächsten Seite (oder None, wenn es keine
+    weiteren Sitzungen gibt).
+    """
+    if limit is None:
+        sessions = cached_sessions(start_date, end_date, task_name) if after is None else \
+            iter_sessions(start_date, end_date, task_name, after)
+    else:
+        # Eine Zeile mehr lesen, um zu erkennen, ob es eine weitere Seite gibt
+        sessions = _cached_page(start_date, end_date, task_name, after, limit) or \
+            iter_sessions(start_date, end_date, task_name, after, limit + 1)
+
+    count = 0
+    last_id = None
+    for session in sessions:
+        if limit is not None and count == limit:
+            output_func(f"Weitere Sitzungen vorhanden: fortsetzen mit after={last_id}")
+            return last_id
+        if count == 0:
+            output_func("Bericht:")
+        duration_min = session.duration_sec / 60
+        output_func(f"Task: {session.task_name}, Start: {format_timestamp(session.start)}, "
+                    f"Ende: {format_timestamp(session.end)}, "
+                    f"Dauer: {duration_min:.2f} Minuten")
+        count += 1
+        last_id = session.id
+
+    if count == 0:
+        output_func("Keine Sitzungen gefunden.")
+    return None
+
+# Gruppierungen für report group=..., jeweils (Bezeichnung, SQL-Ausdruck)
+ROLLUP_GROUPS = {
+    "task": ("Task", "t.name"),
+    "day": ("Tag", "r.day"),
+    # Wochen werden über ihren Montag benannt
+    "week": ("Woche ab", "date(r.day, 'weekday 0', '-6 days')"),
+}
+
+def report_rollup(group, start_date=None, end_date=None, task_name=None, output_func=print):
+    """
+    Zusammenfassender Bericht aus session_rollup (ohne die sessions-Tabelle zu lesen).
+
+    start_date/end_date sind Epoch-Sekunden wie beim Einzelbericht; gezählt
+    werden die Tage ab dem Tag von start_date und vor dem Tag von end_date.
+    """
+    label, key = ROLLUP_GROUPS[group]
+
+    # tasks wird nur für den Namen gebraucht; gelöschte Tasks haben dank
+    # ON DELETE CASCADE keine Tagessummen mehr
+    join = "JOIN tasks t ON t.id = r.task_id" if group == "task" or task_name else ""
+    where = ""
+    params = []
+    if task_name:
+        where += " AND t.name = ?"
+        params.append(task_name)
+    if start_date is not None:
+        where += " AND r.day >= ?"
+        params.append(local_day(start_date))
+    if end_date is not None:
+        where += " AND r.day < ?"
+        params.append(local_day(end_date))
+
+    conn = get_connection()
+    source = "session_rollup r"
+    if group != "task":
+        # Erst je Tag über den abdeckenden Index summieren, dann erst den
+        # Ausdruck (z. B. die Woche) einmal je Tag statt je Zeile berechnen
+        source = f"""(
+            SELECT r.day AS day, SUM(r.total_sec) AS total_sec, SUM(r.count) AS count
+            FROM session_rollup r
+            {join}
+            WHERE 1=1 {where}
+            GROUP BY r.day
+        ) r"""
+        join = where = ""
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT {key} AS grp, SUM(r.total_sec), SUM(r.count)
+        FROM {source}
+        {join}
+        WHERE 1=1 {where}
+        GROUP BY grp
+        ORDER BY grp ASC
+    """, params)
+
+    total_sec = 0
+    total_count = 0
+    for grp, seconds, count in cur:
+        if total_count == 0:
+            output_func(f"Zusammenfassung ({group}):")
+        output_func(f"{label}: {grp}, Sitzungen: {count}, Dauer: {seconds / 60:.2f} Minuten")
+        total_sec += seconds
+        total_count += count
+
+    if total_count == 0:
         output_func("Keine Sitzungen gefunden.")
         return
+    output_func(f"Gesamt: Sitzungen: {total_count}, Dauer: {total_sec / 60:.2f} Minuten")
+
+def rebuild_rollup(output_func=print):
+    """Baut session_rollup vollständig aus der sessions-Tabelle und den Archiven neu auf."""
+    conn = get_connection()
+
+    # Archive vorab auswerten, denn ATTACH ist in der Transaktion nicht möglich.
+    # Archive haben keinen Fremdschlüssel, Sessions gelöschter Tasks bleiben außen vor.
+    archived = []
+    for year in _archive_years(conn):
+        alias = _attach_archives(conn, [year])[0]
+        archived.extend(conn.execute(f"""
+            SELECT task_id, {ROLLUP_DAY_SQL}, SUM(duration_sec), COUNT(*)
+            FROM {alias}.sessions WHERE task_id IN (SELECT id FROM main.tasks)
+            GROUP BY task_id, {ROLLUP_DAY_SQL}
+        """))
+
+    cur = conn.cursor()
+    cur.execute("DELETE FROM session_rollup")
+    cur.execute(f"""
+        INSERT INTO session_rollup (task_id, day, total_sec, count)
+        SELECT task_id, {ROLLUP_DAY_SQL}, SUM(duration_sec), COUNT(*)
+        FROM sessions GROUP BY task_id, {ROLLUP_DAY_SQL}
+    """)
+    entries = cur.rowcount
+    if archived:
+        cur.executemany(ROLLUP_UPSERT, archived)
+        entries = conn.execute("SELECT COUNT(*) FROM session_rollup").fetchone()[0]
+    _commit(conn)
+    output_func(f"Tagessummen neu aufgebaut ({entries} Einträge).")
+
+@functools.lru_cache(maxsize=None)
+def _template_environment():
+    """
+    Jinja-Environment einmal pro Prozess erzeugen.
+
+    Kompilierte Templates bleiben im Environment gecacht, der Bytecode-Cache
+    (im Temp-Verzeichnis) spart das Kompilieren auch über Prozessgrenzen hinweg.
+    jinja2 wird erst hier importiert, damit die CLI ohne Export schnell startet.
+    """
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 
-    output_func("Bericht:")
-    for tname, start, end, duration_sec in sessions:
-        duration_min = duration_sec / 60
-        output_func(f"Task: {tname}, Start: {start}, Ende: {end}, Dauer: {duration_min:.2f} Minuten")
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
+    env.filters["timestamp"] = format_timestamp
+    return env
 
-def export_report_to_html(output_path=None, start_date=None, end_date=None, task_name=None):
+def export_report_to_html(output_path=None, start_date=None, end_date=None, task_name=None, output_func=print):
     """
     Exportiert den Bericht als HTML.
+
+    Die Sessions werden direkt aus dem Cursor in Template.generate() gereicht
+    und die Teilstücke sofort in die Datei geschrieben.
     """
     import datetime
     timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     if not output_path:
         output_path = f"./report_{timestamp}.html"
 
-    conn = sqlite3.connect(DB_NAME)
+    if os.path.exists(output_path):
+        output_func(f"Die Datei '{output_path}' existiert bereits. Bericht wird nicht überschrieben.")
+        return
+
+    from jinja2 import TemplateNotFound
+
+    # Template laden
+    try:
+        template = _template_environment().get_template(REPORT_TEMPLATE)
+    except TemplateNotFound:
+        output_func(f"Template-Datei '{REPORT_TEMPLATE}' wurde nicht gefunden.")
+        return
+
+    from analytics import analyse
+
+    if not _write_html(template, output_path, cached_sessions(start_date, end_date, task_name),
+                       analytics=analyse(start_date, end_date, task_name)):
+        output_func("Keine Sitzungen gefunden.")
+        return
+
+    output_func(f"Bericht wurde erfolgreich als HTML exportiert: {output_path}")
+
+def _write_html(template, output_path, sessions, **context):
+    """
+    Rendert die Sessions per Template.generate() direkt in die Datei.
+
+    'context' sind weitere Template-Variablen (z. B. analytics). Liefert
+    False (ohne Datei anzulegen), wenn es keine Sessions gibt.
+    """
+    first = next(sessions, None)
+    if first is None:
+        return False
+
+    with open(output_path, "w", encoding="utf-8") as html_file:
+        html_file.writelines(template.generate(sessions=chain((first,), sessions), **context))
+    return True
+
+# Aufteilungen für export-all: SQL-Ausdruck, der den Teil einer Session bestimmt
+EXPORT_SPLITS = {
+    "task": "t.name",
+    "month": "strftime('%Y-%m', s.start, 'unixepoch', 'localtime')",
+}
+
+def _month_bounds(month):
+    """Epoch-Sekunden von Monatsbeginn und Folgemonat zu 'YYYY-MM' (lokale Zeit)."""
+    year, number = map(int, month.split("-"))
+    first = datetime.datetime(year, number, 1)
+    following = datetime.datetime(year + number // 12, number % 12 + 1, 1)
+    return int(first.timestamp()), int(following.timestamp())
+
+def _partition_file_name(part, used):
+    """Dateiname für einen Teil; Sonderzeichen werden ersetzt, Dubletten nummeriert."""
+    import re
+
+    base = re.sub(r"[^\w.-]+", "_", part).strip("._") or "task"
+    name = base
+    number = 1
+    while name in used:
+        number += 1
+        name = f"{base}-{number}"
+    used.add(name)
+    return name + ".html"
+
+def plan_export_partitions(split, start_date=None, end_date=None, task_name=None):
+    """
+    Bestimmt mit einer Abfrage alle Teile für export-all.
+
+    Liefert eine Liste von (Teil, Anzahl Sessions), sortiert nach Teil.
+    """
+    conn = get_connection()
+    archives = _attach_archives(conn, _archive_years(conn, start_date, end_date))
+    query, params = _session_query(start_date, end_date, task_name, archives=archives,
+                                   columns=f"{EXPORT_SPLITS[split]} AS part")
     cur = conn.cursor()
+    cur.execute(f"SELECT part, COUNT(*) FROM ({query}) GROUP BY part ORDER BY part", params)
+    return cur.fetchall()
 
-    task_filter = ""
-    params = []
+def _export_partition(db_name, output_path, filters):
+    """
+    Arbeitsfunktion im Prozess-Pool: rendert einen Teilbericht.
 
-    if task_name:
-        task_filter += " AND t.name = ?"
-        params.append(task_name)
+    Der Datenbankpfad wird mitgegeben, weil Kindprozesse (forkserver, spawn)
+    db.DB_NAME nicht erben.
+    """
+    global DB_NAME
+    DB_NAME = db_name
+    if os.path.exists(output_path):
+        return False
+    from analytics import analyse
 
-    if start_date:
-        task_filter += " AND s.start >= ?"
-        params.append(start_date)
+    template = _template_environment().get_template(REPORT_TEMPLATE)
+    return _write_html(template, output_path, iter_sessions(**filters), analytics=analyse(**filters))
 
-    if end_date:
-        task_filter += " AND s.end <= ?"
-        params.append(end_date)
+# Startmethoden für den Prozess-Pool von export-all, die erste verfügbare gilt.
+# Kein fork: GUI-Worker und Server-Thread halten womöglich gerade Locks
+# (stats, logging, SQLite), die ein geforkter Kindprozess nie freigibt.
+EXPORT_START_METHODS = ("forkserver", "spawn")
 
-    query = f"""
-        SELECT t.name, s.start, s.end, s.duration_sec
-        FROM tasks t
-        JOIN sessions s ON t.id = s.task_id
-        WHERE 1=1 {task_filter}
-        ORDER BY s.start ASC
+def export_all_reports(output_dir, split, start_date=None, end_date=None, task_name=None,
+                       workers=None, output_func=print):
     """
+    Exportiert je Task bzw. je Monat (Beginn der Session) einen HTML-Bericht.
 
-    cur.execute(query, params)
-    sessions = cur.fetchall()
-    conn.close()
+    Die Teile werden mit einer Abfrage geplant und in einem Prozess-Pool
+    gerendert. Bereits vorhandene Dateien werden nicht überschrieben.
+    Die Kindprozesse werden nicht per fork aus dem (oft mehrfädigen)
+    Aufrufer erzeugt, sondern per forkserver bzw. spawn (siehe EXPORT_START_METHODS).
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
 
-    if not sessions:
-        print("Keine Sitzungen gefunden.")
+    parts = plan_export_partitions(split, start_date, end_date, task_name)
+    if not parts:
+        output_func("Keine Sitzungen gefunden.")
         return
 
-    # Template laden
-    try:
-        with open("template_report.html", "r", encoding="utf-8") as template_file:
-            template_content = template_file.read()
-    except FileNotFoundError:
-        print("Template-Datei 'template_report.html' wurde nicht gefunden.")
-        return
+    # Kindprozesse sehen nur committete Daten
+    conn = get_connection()
+    if conn.in_transaction:
+        conn.commit()
+
+    # Template einmal im Elternprozess kompilieren (Bytecode-Cache für die Kinder)
+    _template_environment().get_template(REPORT_TEMPLATE)
+
+    os.makedirs(output_dir, exist_ok=True)
+    db_name = os.path.abspath(DB_NAME)
+    used = set()
+    jobs = []
+    for part, _ in parts:
+        filters = {"start_date": start_date, "end_date": end_date, "task_name": task_name}
+        if split == "task":
+            filters["task_name"] = part
+        else:
+            month_start, month_end = _month_bounds(part)
+            filters["start_date"] = max(month_start, start_date) if start_date is not None else month_start
+            filters["start_before"] = month_end
+        jobs.append((os.path.join(output_dir, _partition_file_name(part, used)), filters))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    started = time.perf_counter()
+    method = next(m for m in EXPORT_START_METHODS if m in multiprocessing.get_all_start_methods())
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        written = pool.map(_export_partition, [db_name] * len(jobs), *zip(*jobs),
+                           chunksize=max(1, len(jobs) // (workers * 4)))
+        written = sum(written)
+
+    elapsed = time.perf_counter() - started
+    sessions = sum(count for _, count in parts)
+    output_func(f"{written} Berichte ({sessions} Sitzungen) nach '{output_dir}' exportiert "
+                f"in {elapsed:.1f} s mit {workers} Prozessen.")
+    if written < len(jobs):
+        output_func(f"{len(jobs) - written} Dateien existierten bereits und wurden nicht überschrieben.")
+
+
+# Zeilen pro fetchmany() beim CSV/NDJSON-Export
+EXPORT_CHUNK_SIZE = 5000
+
+# Export-Formate und ihre Dateiendungen (HTML läuft über das Template)
+EXPORT_FORMATS = {"html": ".html", "csv": ".csv", "ndjson": ".ndjson"}
 
-    template = Template(template_content)
-    html_content = template.render(sessions=sessions)
+# Spalten wie beim Import, damit Exporte wieder eingelesen werden können.
+# Die Zeilen formatiert SQLite (Zeitstempel in lokaler Zeit wie
+# format_timestamp), in Python wird nur noch geschrieben.
+EXPORT_FIELDS = ("task", "start", "end", "duration_sec")
+_EXPORT_VALUES = (
+    "t.name",
+    "strftime('%Y-%m-%d %H:%M:%S', s.start, 'unixepoch', 'localtime')",
+    "strftime('%Y-%m-%d %H:%M:%S', s.end, 'unixepoch', 'localtime')",
+    "s.duration_sec",
+)
+EXPORT_COLUMNS = {
+    "csv": ", ".join(_EXPORT_VALUES),
+    # Eine fertige JSON-Zeile pro Session direkt aus SQLite (JSON1)
+    "ndjson": "json_object(" + ", ".join(f"'{field}', {value}"
+                                         for field, value in zip(EXPORT_FIELDS, _EXPORT_VALUES)) + ")",
+}
+
+def export_format_for_path(path):
+    """Leitet das Format aus der Dateiendung ab (.gz wird ignoriert), sonst None."""
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith(".jsonl"):
+        return "ndjson"
+    for fmt, extension in EXPORT_FORMATS.items():
+        if name.endswith(extension):
+            return fmt
+    return None
+
+def export_sessions(output_path, fmt, start_date=None, end_date=None, task_name=None, output_func=print):
+    """
+    Exportiert die gefilterten Sessions als CSV oder NDJSON.
+
+    Die Zeilen werden blockweise per fetchmany() gelesen und direkt in die
+    Datei geschrieben, der Speicherbedarf hängt also nicht von der Anzahl der
+    Sessions ab. Endet der Pfad auf .gz, wird gzip-komprimiert. Geschrieben
+    wird in eine .part-Datei, die erst am Ende umbenannt wird.
+    """
+    import csv
+    import gzip
 
     if os.path.exists(output_path):
-        print(f"Die Datei '{output_path}' existiert bereits. Bericht wird nicht überschrieben.")
+        output_func(f"Die Datei '{output_path}' existiert bereits. Export wird nicht überschrieben.")
         return
 
-    with open(output_path, "w", encoding="utf-8") as html_file:
-        html_file.write(html_content)
+    cur = _session_cursor(start_date, end_date, task_name, columns=EXPORT_COLUMNS[fmt])
+    chunk = cur.fetchmany(EXPORT_CHUNK_SIZE)
+    if not chunk:
+        output_func("Keine Sitzungen gefunden.")
+        return
+
+    part_path = output_path + ".part"
+    if output_path.lower().endswith(".gz"):
+        # Stufe 6 statt 9: kaum größer, aber deutlich schneller
+        out = gzip.open(part_path, "wt", encoding="utf-8", newline="", compresslevel=6)
+    else:
+        out = open(part_path, "w", encoding="utf-8", newline="")
+
+    count = 0
+    started = time.perf_counter()
+    try:
+        with out:
+            if fmt == "csv":
+                writer = csv.writer(out)
+                writer.writerow(EXPORT_FIELDS)
+                while chunk:
+                    writer.writerows(chunk)
+                    count += len(chunk)
+                    chunk = cur.fetchmany(EXPORT_CHUNK_SIZE)
+            else:
+                while chunk:
+                    out.writelines(row[0] + "\n" for row in chunk)
+                    count += len(chunk)
+                    chunk = cur.fetchmany(EXPORT_CHUNK_SIZE)
+        os.replace(part_path, output_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
 
-    print(f"Bericht wurde erfolgreich als HTML exportiert: {output_path}")
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    output_func(f"{count} Sitzungen als {fmt.upper()} exportiert: {output_path} ({rate:.0f} Sitzungen/s)")
@@ -1,19 +1,113 @@
 # gui.py / python3.7 and higher
+import os
 import sys
+import collections
+import queue
+import threading
+import time
 import tkinter as tk
 import tkinter.scrolledtext as scrolledtext
 
 from PIL import Image, ImageDraw
 from pystray import Icon, Menu, MenuItem
 
-from commands import handle_command
-from db import list_tasks, start_task, stop_task, delete_task
+from commands import handle_command, split_command, complete_word, COMMANDS, UsageError
+from db import (iter_tasks, get_task, start_task, stop_task, delete_task, delete_tasks, is_task_pattern,
+                match_tasks, format_task_list, running_tasks, format_elapsed)
+
+# Seitengröße für 'report' in der GUI, wenn kein limit= angegeben ist
+REPORT_PAGE_SIZE = 100
+
+# Intervall (ms), in dem der Tk-Thread Ausgaben des Workers abholt
+UI_POLL_MS = 50
+
+# Maximale Anzahl Zeilen in der Ausgabe-Box, ältere Zeilen werden verworfen
+OUTPUT_MAX_LINES = 5000
+
+WINDOW_TITLE = "Task - Zeiterfassung GUI"
+
+
+class OutputBuffer:
+    """
+    Sammelt Ausgabezeilen und schreibt sie gebündelt in ein Text-Widget.
+
+    write() ist threadsicher (deque), flush() darf nur im Tk-Hauptthread laufen.
+    Pro flush() gibt es genau ein insert() und ein see(); das Widget behält
+    höchstens max_lines Zeilen (Ringpuffer).
+    """
+
+    def __init__(self, widget, max_lines=OUTPUT_MAX_LINES):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.pending = collections.deque()
+        self.line_count = 0
+
+    def write(self, text):
+        self.pending.append(text)
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines = []
+        while self.pending:
+            lines.append(self.pending.popleft())
+        # Was ohnehin sofort wieder verworfen würde, gar nicht erst einfügen
+        if len(lines) > self.max_lines:
+            lines = lines[-self.max_lines:]
+
+        self.widget.insert(tk.END, "\n".join(lines) + "\n")
+        self.line_count += sum(line.count("\n") + 1 for line in lines)
+
+        excess = self.line_count - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+            self.line_count -= excess
+        self.widget.see(tk.END)
+
+
+class CommandExecutor:
+    """
+    Führt Datenbankarbeit nacheinander auf einem eigenen Worker-Thread aus.
+
+    Aufträge aus dem Tk-Hauptthread und aus dem Tray-Thread landen in derselben
+    Queue, dadurch bleiben Start/Stop-Wechsel auch bei schnellem Klicken geordnet.
+    """
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, on_done=None, **kwargs):
+        """Reiht func(*args, **kwargs) ein; on_done(result) läuft danach im Worker."""
+        self.jobs.put((func, args, kwargs, on_done))
+
+    def shutdown(self):
+        """Beendet den Worker, nachdem alle offenen Aufträge erledigt sind."""
+        self.jobs.put(None)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            func, args, kwargs, on_done = job
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                # Fehler in einem Auftrag dürfen den Worker nicht beenden
+                output_func = kwargs.get("output_func")
+                if output_func:
+                    output_func(f"Fehler: {e}")
+                continue
+            if on_done:
+                on_done(result)
 
 
 class TaskGUI(tk.Tk):
     def __init__(self):
         super().__init__()
-        self.title("Task - Zeiterfassung GUI")
+        self.title(WINDOW_TITLE)
         self.geometry("600x400")
         self.configure(bg="black")
 
@@ -23,6 +117,13 @@ class TaskGUI(tk.Tk):
         # Temporäre Löschanfrage (GUI-Sicherheitsabfrage)
         self.pending_delete = None
 
+        # Letzter seitenweiser Bericht: (Befehl ohne after=, nächste Position)
+        self.report_page = None
+
+        # Datenbankarbeit läuft im Worker, Ergebnisse kommen über ui_queue zurück
+        self.executor = CommandExecutor()
+        self.ui_queue = queue.Queue()
+
         # Tray-Icon-Objekt und -Status
         self.tray_icon = None
         self.tray_icon_initialized = False
@@ -35,6 +136,13 @@ class TaskGUI(tk.Tk):
             self, wrap=tk.WORD, height=20, bg="black", fg="#ffb347"
         )
         self.output_box.pack(fill=tk.BOTH, expand=True)
+        self.output = OutputBuffer(self.output_box)
+        self.flush_scheduled = False
+
+        # Laufzeit der aktiven Tasks, sekündlich aus dem Speicherstand (running_tasks)
+        self.running_text = ""
+        self.running_label = tk.Label(self, text="", anchor="w", bg="black", fg="#ffb347")
+        self.running_label.pack(fill=tk.X)
 
         # Eingabe-Zeile
         self.input_var = tk.StringVar()
@@ -46,6 +154,7 @@ class TaskGUI(tk.Tk):
             insertbackground="#ffb347",
         )
         self.entry.bind("<Return>", self.execute_command)
+        self.entry.bind("<Tab>", self.complete_input)
         self.entry.pack(fill=tk.X)
 
         # Fokus direkt auf das Eingabefeld
@@ -55,6 +164,29 @@ class TaskGUI(tk.Tk):
         # Begrüßung
         self.print_line("Willkommen zur Task Manager GUI! Geben Sie einen Befehl ein.")
 
+        self.after(UI_POLL_MS, self._process_ui_queue)
+        self._tick()
+
+    def _tick(self):
+        """
+        Sekundentakt: aktualisiert Laufzeit-Anzeige, Fenstertitel und Tray-Menü.
+
+        Liest nur den Speicherstand der laufenden Tasks, keine Datenbankabfrage.
+        """
+        now = time.time()
+        running = running_tasks()
+        text = " | ".join(f"▶ {name} {format_elapsed(now - start)}" for name, start in sorted(running.items()))
+        if text != self.running_text:
+            self.running_text = text
+            self.running_label.config(text=text)
+            self.title(f"{WINDOW_TITLE} – {text}" if text else WINDOW_TITLE)
+            # Die Beschriftungen im Tray-Menü sind Callables und lesen denselben Stand
+            if self.tray_icon_initialized and self.tray_icon:
+                self.tray_icon.update_menu()
+
+        # Auf die nächste volle Sekunde ausrichten, damit die Anzeige nicht driftet
+        self.after(1000 - int(now * 1000) % 1000, self._tick)
+
     def execute_command(self, event=None):
         command = self.input_var.get().strip()
         if not command:
@@ -66,10 +198,13 @@ class TaskGUI(tk.Tk):
         # Wenn eine Löschanfrage aussteht
         if self.pending_delete:
             if command.lower() in ["y", "yes"]:
-                taskname = self.pending_delete
+                taskname, is_pattern = self.pending_delete
                 self.pending_delete = None
                 # Jetzt wird wirklich gelöscht - ohne weitere Abfrage
-                delete_task(taskname, output_func=self.print_line, is_gui=False)
+                if is_pattern:
+                    self.executor.submit(delete_tasks, taskname, output_func=self.post_line)
+                else:
+                    self.executor.submit(delete_task, taskname, output_func=self.post_line, is_gui=False)
             elif command.lower() in ["n", "no"]:
                 self.print_line("Löschen abgebrochen.")
                 self.pending_delete = None
@@ -78,30 +213,129 @@ class TaskGUI(tk.Tk):
             return
 
         # Normale Befehlsverarbeitung
-        cmd_lower = command.lower()
-        if cmd_lower.startswith("delete"):
-            parts = command.split(" ", 1)
-            if len(parts) > 1 and parts[1]:
-                taskname = parts[1]
-                self.pending_delete = taskname
-                self.print_line(f"Willst du den Task '{taskname}' wirklich löschen? (y/n):")
-            else:
-                self.print_line("Syntax: delete <taskname>")
+        cmd, args = split_command(command)
+        if cmd == "delete":
+            # Argumente wie in der CLI prüfen, gelöscht wird erst nach Bestätigung
+            try:
+                taskname = COMMANDS["delete"].parse(args, self.print_line)["taskname"]
+            except UsageError as e:
+                self.print_line(str(e))
+                return
+            # Ob Muster und welche Tasks passen, klärt der Worker; gefragt wird im Tk-Thread
+            self.executor.submit(
+                self._resolve_delete, taskname, output_func=self.post_line,
+                on_done=lambda names: self.call_in_ui(self._ask_delete, taskname, names),
+            )
 
-        elif cmd_lower == "collwin":
+        elif cmd == "collwin":
             self.toggle_collapse()
 
-        elif cmd_lower == "exit":
+        elif cmd == "report":
+            self.run_report(command)
+
+        elif cmd == "page":
+            if self.report_page:
+                base_command, after = self.report_page
+                self.run_report(f"{base_command} after={after}")
+            else:
+                self.print_line("Keine weitere Berichtsseite vorhanden.")
+
+        elif cmd == "exit":
             self.close_application()
 
         else:
-            # Alle anderen Befehle an handle_command
-            handle_command(command, output_func=self.print_line)
+            # Alle anderen Befehle an handle_command (im Worker)
+            self.executor.submit(handle_command, command, output_func=self.post_line)
+
+    @staticmethod
+    def _resolve_delete(taskname, output_func=None):
+        """Im Worker: None für einen einzelnen Task, sonst die Namen, auf die das Muster passt."""
+        return match_tasks(taskname) if is_task_pattern(taskname) else None
+
+    def _ask_delete(self, taskname, names):
+        """Stellt die Löschrückfrage (Tk-Thread) zum Ergebnis von _resolve_delete."""
+        if names is None:
+            self.pending_delete = (taskname, False)
+            self.print_line(f"Willst du den Task '{taskname}' wirklich löschen? (y/n):")
+        elif not names:
+            self.print_line(f"Kein Task passt zu '{taskname}'.")
+        else:
+            # Bei Mustern zeigen, was gelöscht würde
+            self.pending_delete = (taskname, True)
+            self.print_line(f"Willst du {len(names)} Task(s) wirklich löschen ({format_task_list(names)})? (y/n):")
+
+    def complete_input(self, event=None):
+        """
+        Tab: ergänzt das Wort vor dem Cursor (Befehl, Optionswert oder Taskname).
+
+        Bei einem Treffer wird das Wort ersetzt, bei mehreren bis zum gemeinsamen
+        Anfang ergänzt und die Kandidaten werden angezeigt. Läuft im Tk-Thread,
+        die Namensliste liegt im Speicher (db.task_names).
+        """
+        cursor = self.entry.index(tk.INSERT)
+        before = self.input_var.get()[:cursor]
+        matches = complete_word(before)
+        if matches:
+            word_start = before.rfind(" ") + 1
+            if len(matches) == 1:
+                replacement = matches[0] + " "
+            else:
+                replacement = os.path.commonprefix(matches)
+                self.print_line("  ".join(matches))
+            self.entry.delete(word_start, cursor)
+            self.entry.insert(word_start, replacement)
+        # Kein Fokuswechsel per Tab
+        return "break"
+
+    def run_report(self, command):
+        """
+        Führt 'report' seitenweise aus und merkt sich die nächste Position für 'page'.
+        """
+        parts = [p for p in command.split() if not p.startswith("after=")]
+        if not any(p.startswith("limit=") for p in parts):
+            parts.append(f"limit={REPORT_PAGE_SIZE}")
+        after = [p for p in command.split() if p.startswith("after=")]
+        base_command = " ".join(parts)
+
+        def remember_page(next_after):
+            self.report_page = (base_command, next_after) if next_after is not None else None
+            if self.report_page:
+                self.print_line("Mit 'page' die nächste Seite anzeigen.")
+
+        self.executor.submit(
+            handle_command, " ".join(parts + after), output_func=self.post_line,
+            on_done=lambda next_after: self.call_in_ui(remember_page, next_after),
+        )
 
     def print_line(self, text: str):
-        """Schreibt Text ans Ende des ScrolledText."""
-        self.output_box.insert(tk.END, text + "\n")
-        self.output_box.see(tk.END)
+        """Schreibt Text ans Ende des ScrolledText (nur im Tk-Hauptthread aufrufen)."""
+        self.output.write(text)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.after_idle(self._flush_output)
+
+    def post_line(self, text: str):
+        """Threadsichere Ausgabe: gepuffert, geschrieben beim nächsten Poll-Tick."""
+        self.output.write(text)
+
+    def _flush_output(self):
+        self.flush_scheduled = False
+        self.output.flush()
+
+    def call_in_ui(self, func, *args):
+        """Führt func(*args) threadsicher im Tk-Hauptthread aus."""
+        self.ui_queue.put((func, args))
+
+    def _process_ui_queue(self):
+        """Arbeitet alle Aufträge aus Worker- und Tray-Thread ab (per after())."""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                func(*args)
+        except queue.Empty:
+            pass
+        self.output.flush()
+        self.after(UI_POLL_MS, self._process_ui_queue)
 
     def toggle_collapse(self):
         """Klappt die Ausgabe-Box ein oder aus."""
@@ -126,7 +360,7 @@ class TaskGUI(tk.Tk):
             self.tray_icon.run_detached()
             self.tray_icon_initialized = True
         else:
-            self.update_tray_menu()
+            self.executor.submit(self.update_tray_menu)
 
     def create_tray_icon(self):
         """Erzeugt ein einfaches Icon (64x64) mit 'T'."""
@@ -150,15 +384,15 @@ class TaskGUI(tk.Tk):
         def make_tray_callback(task_name):
             """Erzeugt einen Callback (icon, item) -> toggelt 'task_name'."""
             def tray_callback(icon, item):
-                self._toggle_task(task_name)
+                # Läuft im Tray-Thread: Arbeit an den Worker übergeben
+                self.executor.submit(self._toggle_task, task_name)
             return tray_callback
 
-        for name, is_running, _ in tasks:
-            prefix = "✓ " if is_running else ""
+        for task in tasks:
             menu_items.append(
                 MenuItem(
-                    f"{prefix}{name}",
-                    make_tray_callback(name)  # der Callback weiß, welchen Task er togglen soll
+                    self._tray_label(task.name),  # Beschriftung wird bei jeder Anzeige neu berechnet
+                    make_tray_callback(task.name)  # der Callback weiß, welchen Task er togglen soll
                 )
             )
 
@@ -167,25 +401,35 @@ class TaskGUI(tk.Tk):
 
         return Menu(*menu_items)
 
+    @staticmethod
+    def _tray_label(task_name):
+        """Beschriftung für pystray: '✓ name (H:MM:SS)' für laufende Tasks, aus dem Speicherstand."""
+        def label(item):
+            start = running_tasks().get(task_name)
+            if start is None:
+                return task_name
+            return f"✓ {task_name} ({format_elapsed(time.time() - start)})"
+        return label
+
     def _toggle_task(self, task_name):
-        """Startet oder stoppt den Task (task_name) abhängig vom aktuellen Status."""
-        tasks = self.get_tasks()
-        for (tname, is_running, _) in tasks:
-            if tname == task_name:
-                if is_running:
-                    stop_task(task_name, output_func=self.print_line)
-                else:
-                    start_task(task_name, output_func=self.print_line)
-                break
+        """
+        Startet oder stoppt den Task (task_name) abhängig vom aktuellen Status.
+
+        Läuft im Worker-Thread (siehe CommandExecutor).
+        """
+        if task_name in running_tasks():
+            stop_task(task_name, output_func=self.post_line)
+        elif get_task(task_name) is not None:
+            start_task(task_name, output_func=self.post_line)
         self.update_tray_menu()
 
     def _open_callback(self, icon, item):
-        """Callback zum Öffnen (aus dem Tray)."""
-        self.show_window()
+        """Callback zum Öffnen (aus dem Tray-Thread, daher über die UI-Queue)."""
+        self.call_in_ui(self.show_window)
 
     def _quit_callback(self, icon, item):
         """Callback zum kompletten Beenden."""
-        self.close_application()
+        self.call_in_ui(self.close_application)
 
     def update_tray_menu(self):
         """Aktualisiert das Tray-Menü (z. B. nach Start/Stop)."""
@@ -194,35 +438,8 @@ class TaskGUI(tk.Tk):
             self.tray_icon.update_menu()
 
     def get_tasks(self):
-        """
-        Fragt list_tasks() ab und parst das Ergebnis.
-
-        Erwartetes Format je Zeile:
-          Task: <Name>, Status: läuft/inaktiv, Mindest-Minuten: <Zahl>
-        """
-        lines = []
-
-        def collector(line):
-            lines.append(line)
-
-        list_tasks(output_func=collector)
-
-        if not lines:
-            return []
-
-        parsed_tasks = []
-        for task_info in lines:
-            # task_info sollte aussehen wie: "Task: foo, Status: läuft, Mindest-Minuten: 10"
-            try:
-                parts = task_info.split(", ")
-                name = parts[0].split(": ")[1]
-                is_running = (parts[1].split(": ")[1] == "läuft")
-                min_minutes = int(parts[2].split(": ")[1])
-                parsed_tasks.append((name, is_running, min_minutes))
-            except (IndexError, ValueError) as e:
-                self.print_line(f"Fehler beim Parsen: {task_info} ({e})")
-
-        return parsed_tasks
+        """Liefert alle Tasks als Task-Objekte (name, is_running, minimum_minutes, ...)."""
+        return list(iter_tasks())
 
     def show_window(self):
         """Zeigt das Fenster wieder an (aus der Tray-Ansicht)."""
@@ -236,5 +453,6 @@ class TaskGUI(tk.Tk):
         """Beendet die Anwendung vollständig."""
         if self.tray_icon_initialized and self.tray_icon:
             self.tray_icon.stop()
+        self.executor.shutdown()
         self.destroy()
         sys.exit(0)
@@ -2,32 +2,104 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import sys
-from db import init_db
+import time
+from db import init_db, batch, commit_batch
 from commands import handle_command
-from gui import TaskGUI
+import stats
+
+# Im Batch-Modus wird nach so vielen Befehlen gemeinsam committet
+BATCH_COMMIT_EVERY = 1000
+
+def run_batch(source):
+    """
+    Führt Befehle zeilenweise aus einer Datei (oder '-' für stdin) aus.
+
+    Alle Befehle laufen im selben Prozess über dieselbe Verbindung,
+    committet wird gruppiert alle BATCH_COMMIT_EVERY Befehle.
+    Leere Zeilen und Zeilen mit '#' am Anfang werden übersprungen.
+    """
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    count = 0
+    started = time.perf_counter()
+    try:
+        with batch():
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    handle_command(line, output_func=print)
+                except Exception as e:
+                    print(f"Fehler in Zeile {line_number}: {e}")
+                count += 1
+                if count % BATCH_COMMIT_EVERY == 0:
+                    commit_batch()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"{count} Befehle in {elapsed:.3f} s ausgeführt ({rate:.0f} Befehle/s).")
 
 def main():
     """Haupt-Einstiegspunkt für CLI oder GUI."""
+    profile_path = os.environ.get(stats.PROFILE_ENV)
+
+    # Läuft ein Server ('main.py serve'), übernimmt er normale Befehle
+    # (außer beim Profilieren, das nur lokal sinnvoll ist)
+    if (len(sys.argv) >= 2 and sys.argv[1].lower() not in ("gui", "batch", "serve", "shell")
+            and not profile_path):
+        # server erst hier laden, der Kaltstart der CLI bleibt schlank
+        import server
+        if server.forward(" ".join(sys.argv[1:]), output_func=print):
+            return
+
     init_db()
 
     if len(sys.argv) < 2:
         print("Willkommen im Task- und Zeiterfassungstool!")
         print("Nutze 'help' für eine Liste der verfügbaren Befehle.")
-        print("Oder starte 'python main.py gui' für die GUI.\n")
+        print("Oder starte 'python main.py gui' für die GUI bzw. 'python main.py shell' für die Shell.\n")
         return
 
     command = sys.argv[1].lower()
     args = sys.argv[2:]  # weitere Argumente
 
     if command == "gui":
-        # Starte die Tkinter-GUI
+        # Starte die Tkinter-GUI (tkinter, PIL und pystray erst hier laden)
+        from gui import TaskGUI
         app = TaskGUI()
         app.mainloop()
+    elif command == "batch":
+        if not args:
+            print("Syntax: batch <datei|->")
+            return
+        try:
+            run_batch(args[0])
+        except FileNotFoundError:
+            print(f"Datei '{args[0]}' wurde nicht gefunden.")
+    elif command == "serve":
+        import server
+        server.serve(output_func=print)
+    elif command == "shell":
+        from shell import run_shell
+        run_shell()
     else:
         # Command-Line-Modus
         line = " ".join(sys.argv[1:])
-        handle_command(line, output_func=print)
+        if profile_path:
+            stats.profile_call(profile_path, handle_command, line, output_func=print)
+            print(f"Profil geschrieben: {profile_path}")
+        else:
+            handle_command(line, output_func=print)
+            # Ein Einzelbefehl beendet den Prozess gleich wieder; die Statistik
+            # wird daher direkt ausgegeben (außer 'stats' zeigt sie ohnehin)
+            if stats.ENABLED and command != "stats":
+                print()
+                stats.show_stats(print)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,147 @@
+# server.py
+"""
+Resident-Modus: hält db-Schicht, Verbindung und Caches warm und nimmt
+Befehle über einen lokalen Unix-Socket entgegen.
+
+Protokoll (zeilenbasiert, UTF-8):
+  Client -> Server:  eine Befehlszeile pro Zeile, z. B. "start foo\n"
+  Server -> Client:  je Ausgabezeile {"out": "..."} als JSON-Zeile,
+                     am Ende des Befehls {"done": true}
+Eine Verbindung kann beliebig viele Befehle nacheinander senden.
+"""
+import os
+
+import db
+
+# Antwortet ein Server nicht binnen dieser Zeit auf Verbindung und Ping,
+# führt die CLI den Befehl selbst aus (Sekunden)
+CONNECT_TIMEOUT = 1.0
+
+# Längste Pause zwischen zwei Antwortzeilen, danach wird abgebrochen (Sekunden).
+# Der Befehl wird dann nicht lokal wiederholt, er könnte schon gewirkt haben.
+REPLY_TIMEOUT = 300.0
+
+
+def socket_path():
+    """Socket liegt neben der Datenbank, damit jede Datenbank ihren eigenen Server hat."""
+    return os.path.abspath(db.DB_NAME) + ".sock"
+
+
+def forward(command_line, output_func=print):
+    """
+    Schickt einen Befehl an den laufenden Server.
+
+    Liefert False, wenn kein Server erreichbar ist oder er auf eine leere
+    Zeile (Ping) nicht binnen CONNECT_TIMEOUT antwortet; der Aufrufer führt
+    den Befehl dann selbst aus. Sonst True. socket und json werden erst
+    geladen, wenn es einen Socket gibt (Kaltstart der CLI ohne Server).
+    """
+    path = socket_path()
+    if not os.path.exists(path):
+        return False
+
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(path)
+        sock.sendall(b"\n")
+        replies = sock.makefile("r", encoding="utf-8")
+        if not replies.readline():
+            raise ConnectionError("Server hat die Verbindung geschlossen")
+    except OSError:
+        sock.close()
+        return False
+
+    import json
+
+    with sock, replies:
+        if not command_line.strip():
+            return True
+        sock.settimeout(REPLY_TIMEOUT)
+        try:
+            sock.sendall((command_line + "\n").encode("utf-8"))
+            for reply in replies:
+                message = json.loads(reply)
+                if message.get("done"):
+                    break
+                output_func(message["out"])
+        except socket.timeout:
+            output_func(f"Server antwortet seit {REPLY_TIMEOUT:.0f} s nicht, Befehl abgebrochen.")
+    return True
+
+
+def serve(output_func=print):
+    """Startet den Server und blockiert bis Strg+C bzw. SIGTERM."""
+    import asyncio
+    import json
+    import signal
+    import socket
+    from concurrent.futures import ThreadPoolExecutor
+    from commands import handle_command
+
+    if not hasattr(socket, "AF_UNIX"):
+        output_func("Der Server-Modus benötigt Unix-Sockets und ist auf diesem System nicht verfügbar.")
+        return
+
+    path = socket_path()
+    if os.path.exists(path):
+        if forward("", output_func=lambda line: None):
+            output_func(f"Server läuft bereits: {path}")
+            return
+        # Übrig gebliebener Socket eines beendeten Servers
+        os.unlink(path)
+
+    # Alle Datenbankarbeit läuft nacheinander auf einem Thread mit einer Verbindung,
+    # die Event-Loop bleibt frei für weitere Clients.
+    db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+    async def handle_client(reader, writer):
+        loop = asyncio.get_running_loop()
+
+        def send(message):
+            writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        def post_line(text):
+            # Wird im db-Thread aufgerufen, Ausgabe streamt sofort zum Client
+            loop.call_soon_threadsafe(send, {"out": text})
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command_line = line.decode("utf-8").strip()
+                try:
+                    await loop.run_in_executor(db_thread, handle_command, command_line, post_line)
+                except Exception as e:
+                    send({"out": f"Fehler: {e}"})
+                send({"done": True})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        server = await asyncio.start_unix_server(handle_client, path=path)
+        output_func(f"Server läuft auf {path} (Beenden mit Strg+C).")
+        async with server:
+            await stop.wait()
+
+    try:
+        asyncio.run(run())
+    finally:
+        db_thread.shutdown(wait=True)
+        if os.path.exists(path):
+            os.unlink(path)
+    output_func("Server beendet.")
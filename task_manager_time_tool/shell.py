@@ -0,0 +1,124 @@
+# shell.py
+"""
+Interaktive Shell ('main.py shell').
+
+Alle Befehle laufen in einem Prozess über dieselbe, warm gehaltene
+Verbindung; Start-Overhead und Schema-Prüfung fallen nur einmal an.
+Mit readline gibt es Zeilenbearbeitung und eine History über Sitzungen
+hinweg. Wie in der GUI setzt 'page' den letzten Bericht mit limit= fort.
+"""
+import os
+
+from commands import handle_command, split_command, complete_word
+from db import get_connection
+
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".tasktool_history")
+HISTORY_LENGTH = 1000
+PROMPT = "task> "
+
+
+def _setup_readline():
+    """Lädt readline samt History; ohne readline (z. B. Windows) None."""
+    try:
+        import readline
+    except ImportError:
+        return None
+
+    readline.set_history_length(HISTORY_LENGTH)
+    try:
+        readline.read_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+
+    # Tab vervollständigt Befehle, Optionswerte und Tasknamen (siehe complete_word).
+    # Nur Leerzeichen trennen Wörter, damit 'task=na' als ein Wort ankommt.
+    readline.set_completer_delims(" ")
+    readline.set_completer(_completer)
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+    return readline
+
+
+_matches = []
+
+def _completer(text, state):
+    """readline-Completer: beim ersten Aufruf (state 0) alle Kandidaten bestimmen."""
+    global _matches
+    if state == 0:
+        import readline
+
+        line = readline.get_line_buffer()[:readline.get_endidx()]
+        _matches = complete_word(line)
+    return _matches[state] if state < len(_matches) else None
+
+
+class Shell:
+    def __init__(self, output_func=print):
+        self.output_func = output_func
+        # (Basisbefehl, after) für 'page', wie report_page in der GUI
+        self.report_page = None
+
+    def run(self):
+        readline = _setup_readline()
+        self.output_func("Task-Shell. 'help' zeigt die Befehle, 'exit' oder Strg+D beendet.")
+        try:
+            while True:
+                try:
+                    line = input(PROMPT)
+                except EOFError:
+                    self.output_func("")
+                    break
+                except KeyboardInterrupt:
+                    self.output_func("")
+                    continue
+                if not self.execute(line):
+                    break
+        finally:
+            if readline is not None:
+                try:
+                    readline.write_history_file(HISTORY_FILE)
+                except OSError:
+                    pass
+
+    def execute(self, line):
+        """Führt eine Zeile aus; liefert False, wenn die Shell enden soll."""
+        cmd, args = split_command(line)
+        if cmd is None:
+            return True
+        if cmd in ("exit", "quit"):
+            return False
+
+        try:
+            if cmd == "report":
+                self.run_report(args)
+            elif cmd == "page":
+                if self.report_page:
+                    base_args, after = self.report_page
+                    self.run_report(base_args + [f"after={after}"])
+                else:
+                    self.output_func("Keine weitere Berichtsseite vorhanden.")
+            else:
+                handle_command(line, output_func=self.output_func)
+        except KeyboardInterrupt:
+            # Abgebrochener Befehl: nichts Halbfertiges committen
+            conn = get_connection()
+            if conn.in_transaction:
+                conn.rollback()
+            self.output_func("Abgebrochen.")
+        except Exception as e:
+            self.output_func(f"Fehler: {e}")
+        return True
+
+    def run_report(self, args):
+        """Führt 'report' aus und merkt sich bei limit= die nächste Seite für 'page'."""
+        base_args = [arg for arg in args if not arg.startswith("after=")]
+        next_after = handle_command(" ".join(["report"] + args), output_func=self.output_func)
+        self.report_page = (base_args, next_after) if next_after is not None else None
+        if self.report_page:
+            self.output_func("Mit 'page' die nächste Seite anzeigen.")
+
+
+def run_shell(output_func=print):
+    Shell(output_func).run()
@@ -0,0 +1,150 @@
+# stats.py
+"""
+Optionale Laufzeitstatistik für Befehle und SQL-Statements.
+
+Eingeschaltet über die Umgebungsvariable TASKTOOL_STATS=1 oder den Befehl
+'stats on'. Ausgeschaltet kostet die Instrumentierung nur eine Abfrage von
+ENABLED je Befehl bzw. Statement.
+Zähler wie die Treffer des Berichts-Caches (report_cache_hit/_miss)
+werden immer erfasst und ebenfalls von 'stats' angezeigt.
+
+TASKTOOL_PROFILE=<datei> schreibt für einen einzelnen CLI-Befehl ein
+cProfile-Ergebnis (auswertbar mit 'python -m pstats <datei>').
+"""
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("TASKTOOL_STATS", "") not in ("", "0")
+
+PROFILE_ENV = "TASKTOOL_PROFILE"
+
+# Obergrenzen der Histogramm-Klassen in Millisekunden (letzte Klasse: alles darüber)
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# SQL-Text wird für die Anzeige gekürzt
+SQL_KEY_LENGTH = 70
+
+_lock = threading.Lock()
+_metrics = {"command": {}, "sql": {}}
+# Einfache Zähler (z. B. Cache-Treffer); werden immer erfasst, da billiger als eine Zeitmessung
+_counters = {}
+
+
+class Metric:
+    """Anzahl, Summe, Maximum und Histogramm der Laufzeiten eines Schlüssels."""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        for index, limit in enumerate(BUCKETS_MS):
+            if ms < limit:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+
+def record(kind, key, seconds):
+    """Erfasst eine Laufzeit für 'command' oder 'sql'."""
+    with _lock:
+        metric = _metrics[kind].get(key)
+        if metric is None:
+            metric = _metrics[kind][key] = Metric()
+        metric.add(seconds)
+
+
+def count(key, n=1):
+    """Erhöht den Zähler 'key'."""
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def record_sql(sql, seconds):
+    record("sql", " ".join(sql.split())[:SQL_KEY_LENGTH], seconds)
+
+
+class timer:
+    """Kontextmanager: misst den Block und erfasst ihn unter (kind, key)."""
+    __slots__ = ("kind", "key", "started")
+
+    def __init__(self, kind, key):
+        self.kind = kind
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.kind, self.key, time.perf_counter() - self.started)
+        return False
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        for metrics in _metrics.values():
+            metrics.clear()
+        _counters.clear()
+
+
+def _histogram(metric):
+    labels = [f"<{limit}" for limit in BUCKETS_MS] + [f">={BUCKETS_MS[-1]}"]
+    return " ".join(f"{label}:{n}" for label, n in zip(labels, metric.buckets) if n)
+
+
+def show_stats(output_func=print, top=15):
+    """Gibt die erfassten Werte aus, je Art sortiert nach Gesamtzeit."""
+    state = "an" if ENABLED else "aus"
+    output_func(f"Statistik ({state}), Zeiten in ms:")
+    with _lock:
+        snapshot = {kind: sorted(metrics.items(), key=lambda item: item[1].total, reverse=True)
+                    for kind, metrics in _metrics.items()}
+        counters = sorted(_counters.items())
+
+    for kind, title in (("command", "Befehle"), ("sql", "SQL-Statements")):
+        items = snapshot[kind]
+        if not items:
+            output_func(f"{title}: keine Daten")
+            continue
+        output_func(f"{title}:")
+        for key, metric in items[:top]:
+            output_func(
+                f"  {key}: n={metric.count}, gesamt={metric.total:.2f}, "
+                f"mittel={metric.total / metric.count:.3f}, max={metric.max:.3f} | {_histogram(metric)}"
+            )
+        if len(items) > top:
+            output_func(f"  ... {len(items) - top} weitere")
+
+    if counters:
+        output_func("Zähler: " + ", ".join(f"{key}={value}" for key, value in counters))
+
+
+def profile_call(path, func, *args, **kwargs):
+    """Führt func unter cProfile aus und schreibt das Ergebnis nach 'path'."""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)